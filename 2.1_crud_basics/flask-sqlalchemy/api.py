@@ -1,6 +1,7 @@
 from flask import Flask, request, jsonify
 from flask_sqlalchemy import SQLAlchemy
 from flask_marshmallow import Marshmallow
+from marshmallow import EXCLUDE, ValidationError, fields, validate
 import os
 
 app = Flask(__name__)
@@ -17,8 +18,8 @@ class Product(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(120), unique=True)
     description = db.Column(db.String(120), unique=False)
-    price = db.Column(db.String(120), unique=False)
-    qty = db.Column(db.String(120), unique=False)
+    price = db.Column(db.Numeric(10, 2, asdecimal=False), unique=False, index=True)
+    qty = db.Column(db.Integer, unique=False)
 
     def __init__(self, description, name, price, qty):
         self.description = description
@@ -28,33 +29,103 @@ class Product(db.Model):
 
 
 class ProductSchema(ma.Schema):
+    name = fields.String(required=True)
+    description = fields.String(required=True)
+    price = fields.Float(required=True, validate=validate.Range(min=0))
+    qty = fields.Integer(required=True, validate=validate.Range(min=0))
+
     class Meta:
         # Fields to expose
         fields = ('description', 'name', 'price', 'qty')
 
 
+class ProductQuerySchema(ma.Schema):
+    min_price = fields.Float(validate=validate.Range(min=0))
+    max_price = fields.Float(validate=validate.Range(min=0))
+    sort = fields.String(validate=validate.OneOf(['price', '-price']))
+
+    class Meta:
+        # Ignore other query parameters (cache busters, tracking parameters)
+        unknown = EXCLUDE
+
+
 product_schema = ProductSchema()
 products_schema = ProductSchema(many=True)
+product_query_schema = ProductQuerySchema()
+
+
+def migrate_numeric_columns():
+    """Convert price/qty of an existing product table from strings to numbers.
+
+    Databases created before price and qty were numeric still store them as
+    VARCHAR, so range filters compare strings and the price index is never
+    used. SQLite cannot change a column type in place, so the table is rebuilt
+    and the rows copied over with CAST. PostgreSQL and MySQL convert the
+    columns with ALTER TABLE; other databases have to be migrated by hand.
+    """
+    inspector = db.inspect(db.engine)
+    if not inspector.has_table('product'):
+        return
+    columns = {column['name']: column['type'] for column in inspector.get_columns('product')}
+    if not isinstance(columns['price'], db.String):
+        return
+
+    dialect = db.engine.dialect.name
+    if dialect not in ('sqlite', 'postgresql', 'mysql'):
+        raise RuntimeError(f"Convert product.price and product.qty to numeric columns by hand on {dialect}")
+
+    with db.engine.begin() as conn:
+        if dialect == 'sqlite':
+            conn.execute(db.text('ALTER TABLE product RENAME TO product_old'))
+            Product.__table__.create(conn)
+            conn.execute(db.text(
+                'INSERT INTO product (id, name, description, price, qty) '
+                'SELECT id, name, description, CAST(price AS NUMERIC), CAST(qty AS INTEGER) FROM product_old'
+            ))
+            conn.execute(db.text('DROP TABLE product_old'))
+        else:
+            if dialect == 'postgresql':
+                conn.execute(db.text('ALTER TABLE product ALTER COLUMN price TYPE NUMERIC(10, 2) USING price::numeric'))
+                conn.execute(db.text('ALTER TABLE product ALTER COLUMN qty TYPE INTEGER USING qty::integer'))
+            else:
+                # MySQL converts the stored strings itself when the column type changes
+                conn.execute(db.text('ALTER TABLE product MODIFY COLUMN price NUMERIC(10, 2), MODIFY COLUMN qty INTEGER'))
+            for index in Product.__table__.indexes:
+                index.create(conn)
 
 
 # endpoint to create new product
 @app.route("/product", methods=["POST"])
 def add_product():
-    description = request.json['description']
-    name = request.json['name']
-    price = request.json['price']
-    qty = request.json['qty']
-    new_product = Product(description, name, price, qty)
+    try:
+        data = product_schema.load(request.json)
+    except ValidationError as err:
+        return jsonify(err.messages), 400
+    new_product = Product(data['description'], data['name'], data['price'], data['qty'])
     db.session.add(new_product)
     db.session.commit()
     product = Product.query.get(new_product.id)
     return product_schema.jsonify(product)
 
-# endpoint to show all products
+# endpoint to show all products, optionally filtered by a price range and sorted by price
 @app.route("/product", methods=["GET"])
 def get_product():
-    all_products = Product.query.all()
-    result = products_schema.dump(all_products)
+    try:
+        args = product_query_schema.load(request.args)
+    except ValidationError as err:
+        return jsonify(err.messages), 400
+
+    query = Product.query
+    if 'min_price' in args:
+        query = query.filter(Product.price >= args['min_price'])
+    if 'max_price' in args:
+        query = query.filter(Product.price <= args['max_price'])
+    if args.get('sort') == 'price':
+        query = query.order_by(Product.price, Product.id)
+    elif args.get('sort') == '-price':
+        query = query.order_by(Product.price.desc(), Product.id.desc())
+
+    result = products_schema.dump(query.all())
     return jsonify(result)
 
 
@@ -69,14 +140,14 @@ def product_detail(id):
 @app.route("/product/<id>", methods=["PUT"])
 def product_update(id):
     product = Product.query.get(id)
-    description = request.json['description']
-    name = request.json['name']
-    price = request.json['price']
-    qty = request.json['qty']
-    product.name = name
-    product.description = description
-    product.price = price
-    product.qty = qty
+    try:
+        data = product_schema.load(request.json)
+    except ValidationError as err:
+        return jsonify(err.messages), 400
+    product.name = data['name']
+    product.description = data['description']
+    product.price = data['price']
+    product.qty = data['qty']
     db.session.commit()
     return product_schema.jsonify(product)
 
@@ -91,5 +162,7 @@ def product_delete(id):
 
 
 if __name__ == '__main__':
-    db.create_all()
+    with app.app_context():
+        migrate_numeric_columns()
+        db.create_all()
     app.run(debug=True)
@@ -2,7 +2,11 @@
 # import modules..... Flask and sqlite3 is used here
 
 from flask import Flask, request, jsonify, make_response
+import atexit
 import sqlite3
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
 from flask_httpauth import HTTPBasicAuth
 
 # Init app
@@ -11,15 +15,57 @@ auth = HTTPBasicAuth()
 
 db_name = "first.db"
 
-@app.before_request
-def initdb_command():
-  try:
-    with sqlite3.connect(db_name) as con:
-      cur = con.cursor()
-      cur.execute("CREATE TABLE IF NOT EXISTS Product (id INTEGER PRIMARY KEY, name text, description text, price INTEGER,qty INTEGER)")
-      con.commit()
-  finally:
-    con.close()
+# Data access layer for the Product table.
+# The dev server runs every request on a new thread, so a connection per thread
+# would be opened (and its CREATE TABLE check run) for every request and never
+# closed. One connection is opened at startup instead and shared by all threads,
+# one at a time under a lock: sqlite serializes writes anyway, and the prepared
+# statements stay in its statement cache instead of being re-parsed per request.
+Product = namedtuple('Product', ['id', 'name', 'description', 'price', 'qty'])
+
+
+def open_connection():
+    con = sqlite3.connect(db_name, cached_statements=256, check_same_thread=False)
+    con.row_factory = lambda cursor, row: Product._make(row)
+    with con:
+        con.execute("CREATE TABLE IF NOT EXISTS Product (id INTEGER PRIMARY KEY, name text, description text, price INTEGER,qty INTEGER)")
+    return con
+
+
+_con = open_connection()
+_con_lock = threading.Lock()
+atexit.register(_con.close)
+
+
+@contextmanager
+def get_connection():
+    with _con_lock:
+        yield _con
+
+
+def find_product(product_id):
+    with get_connection() as con:
+        return con.execute("SELECT id, name, description, price, qty FROM Product WHERE id = ?", (product_id,)).fetchone()
+
+
+def insert_product(name, description, price, qty):
+    with get_connection() as con, con:
+        cur = con.execute("INSERT INTO Product (name, description, price, qty) VALUES (?,?,?,?)",
+                          (name, description, price, qty))
+    return find_product(cur.lastrowid)
+
+
+def update_product(product_id, name, description, price, qty):
+    with get_connection() as con, con:
+        con.execute("UPDATE Product SET name = ?, description = ?, price = ?, qty = ? WHERE id = ?",
+                    (name, description, price, qty, product_id))
+    return find_product(product_id)
+
+
+def delete_product(product_id):
+    with get_connection() as con, con:
+        con.execute("DELETE FROM Product WHERE id = ?", (product_id,))
+
 
 @auth.get_password
 def get_password(username):
@@ -46,32 +92,13 @@ def add_product():
             return res
 
       else:
-
-        name = request.json['name']
-        description = request.json['description']
-        price = request.json['price']
-        qty = request.json['qty']
         try:
-            with sqlite3.connect(db_name) as con:
-                cur = con.cursor()
-                cur.execute("INSERT into Product (name, description, price, qty) values (?,?,?,?)",
-                            (name, description, price, qty))
-                cur.execute('''SELECT * from Product WHERE id = (SELECT MAX(id)  FROM Product)''')
-                # Fetching all rows from the table
-                products = cur.fetchall();
-                response_body = {
-                    "name": products[0][1],
-                    "description": products[0][2],
-                    "price": products[0][3],
-                    "qty": products[0][4]
-                }
-                con.commit()
-                return jsonify({products[0][0]: response_body})
-        except:
-            con.rollback()
+            product = insert_product(req['name'], req['description'], req['price'], req['qty'])
+            response_body = product._asdict()
+            del response_body['id']
+            return jsonify({product.id: response_body})
+        except sqlite3.Error:
             return jsonify("The product could not be added! Contact the admin")
-        finally:
-            con.close()
     else:
         return make_response(jsonify({"message": "Request body must be JSON"}))
 
@@ -80,27 +107,13 @@ def add_product():
 @auth.login_required
 def get_product(id):
   try:
-    with sqlite3.connect(db_name) as con:
-      cur = con.cursor()
-      cur.execute('''SELECT * from Product where id = ?''', (id,))
-      products = cur.fetchall();
-      con.commit()
-      if products!=[]:
-          response_body = {
-              "id": products[0][0],
-              "name": products[0][1],
-              "description" : products[0][2],
-              "price" : products[0][3],
-              "qty" : products[0][4]
-          }
-          return jsonify({products[0][0]: response_body})
+      product = find_product(id)
+      if product is not None:
+          return jsonify({product.id: product._asdict()})
       else:
         return jsonify("The product you searched is over/removed")
-  except:
-      con.rollback()
+  except sqlite3.Error:
       return jsonify("The product you searched could not be read for some reason")
-  finally:
-      con.close()
 
 # Update operation
 
@@ -117,41 +130,17 @@ def update_user():
      else:
 
       try:
-          _json = request.json
-          js_id = _json['id']
-          name = _json['name']
-          description = _json['description']
-          price = _json['price']
-          qty = _json['qty']
-          with sqlite3.connect(db_name) as con:
-             sql = "UPDATE Product SET name=?, description= ?, price= ?, qty= ? WHERE id = ?"
-             cur = con.cursor()
-             cur.execute(sql, (name, description, price, qty, js_id))
-             cur.execute('''SELECT * from Product where id = ?''', (js_id,))
-             products = cur.fetchall();
-             con.commit()
-
-             response_body = {
-                 "id": products[0][0],
-                 "name": products[0][1],
-                 "description": products[0][2],
-                 "price": products[0][3],
-                 "qty": products[0][4]
-             }
-             return jsonify({products[0][0]: response_body})
+          product = update_product(req['id'], req['name'], req['description'], req['price'], req['qty'])
+          if product is None:
+              return jsonify("The id you entered doesnot exist in the database")
+          return jsonify({product.id: product._asdict()})
 
       except KeyError:
             return jsonify("Make sure you enter the id of the product to update it")
 
-      except IndexError:
-          return jsonify("The id you entered doesnot exist in the database")
-
-      except:
+      except sqlite3.Error:
             return jsonify("The product you searched could not be updated for some reason. Check your fields once")
 
-      finally:
-          con.close()
-
     else:
         return make_response(jsonify({"message": "Request body must be JSON"}), 400)
 
@@ -163,18 +152,12 @@ def delete_user():
         _json = request.json
         try:
             if (_json['id'] and request.method == 'DELETE'):
-                js_id = _json['id']
-                with sqlite3.connect(db_name) as con:
-                    cur = con.cursor()
-                    cur.execute("delete from Product where id = ?", (js_id,))
-                    con.commit()
-                    resp = jsonify('Product deleted successfully!')
-                    return resp
-                    con.close()
+                delete_product(_json['id'])
+                return jsonify('Product deleted successfully!')
         except KeyError:
             return jsonify("You have forgotten to enter key or the product with the key doesnot exist in the database")
 
-        except:
+        except sqlite3.Error:
             return jsonify("The product could not be deleted for some reason")
 
 
@@ -1,3 +1,6 @@
+import os
+import sys
+
 from flask import Flask, jsonify, request, abort
 from flask_sqlalchemy import SQLAlchemy
 
@@ -7,6 +10,10 @@ app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///books_authors.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 db = SQLAlchemy(app)
 
+# Helpers shared with other chapters live in ../../common
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from common.streaming import select_fields, stream_rows
+
 
 # Define the Author and Book models
 class Author(db.Model):
@@ -26,30 +33,23 @@ with app.app_context():
     db.create_all()
 
 
+# Columns of the /authors_with_books export; book_author_id shows the column used in the JOIN
+AUTHOR_BOOK_FIELDS = {
+    'author_id': Author.id,
+    'author_name': Author.name,
+    'book_id': Book.id,
+    'book_title': Book.title,
+    'book_author_id': Book.author_id,
+}
+
+
 # API endpoint to demonstrate JOIN
+# ?fields=author_name,book_title selects columns, ?format=ndjson writes one object per line
 @app.route('/authors_with_books', methods=['GET'])
 def get_authors_with_books():
-    # Perform a SQL JOIN using SQLAlchemy ORM relationship
-    authors_with_books = db.session.query(
-        Author.id.label('author_id'),
-        Author.name.label('author_name'),
-        Book.id.label('book_id'),
-        Book.title.label('book_title'),
-        Book.author_id.label('book_author_id')  # This is the join column
-    ).join(Book, Author.id == Book.author_id).all()  # Explicitly specifying join condition
-
-    # Format the result as JSON including join columns (author and book details)
-    result = []
-    for row in authors_with_books:
-        result.append({
-            'author_id': row.author_id,
-            'author_name': row.author_name,
-            'book_id': row.book_id,
-            'book_title': row.book_title,
-            'book_author_id': row.book_author_id  # This shows the column used in JOIN
-        })
-
-    return jsonify(result)
+    # Perform a SQL JOIN, explicitly specifying the join condition
+    statement = db.select(*select_fields(AUTHOR_BOOK_FIELDS)).select_from(Author).join(Book, Author.id == Book.author_id)
+    return stream_rows(db.session, statement)
 
 
 # Create a new author
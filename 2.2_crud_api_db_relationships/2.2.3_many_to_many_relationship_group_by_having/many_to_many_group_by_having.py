@@ -1,3 +1,6 @@
+import os
+import sys
+
 from flask import Flask, jsonify, request, abort
 from flask_sqlalchemy import SQLAlchemy
 
@@ -7,10 +10,17 @@ app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///students_courses.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 db = SQLAlchemy(app)
 
+# Helpers shared with other chapters live in ../../common
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from common.bulk_insert import INSERT_CHUNK_SIZE, insert_ignoring_duplicates
+from common.course_rosters import course_rosters
+
 # Define the Association Table for Many-to-Many Relationship between Students and Courses
 student_course = db.Table('student_course',
                           db.Column('student_id', db.Integer, db.ForeignKey('student.id'), primary_key=True),
-                          db.Column('course_id', db.Integer, db.ForeignKey('course.id'), primary_key=True)
+                          db.Column('course_id', db.Integer, db.ForeignKey('course.id'), primary_key=True),
+                          # The primary key finds a student's courses, this index a course's students
+                          db.Index('ix_student_course_course_id_student_id', 'course_id', 'student_id')
                           )
 
 
@@ -29,6 +39,17 @@ class Course(db.Model):
 # Initialize the database (you only need to run this once)
 with app.app_context():
     db.create_all()
+    # create_all() skips existing tables, so add indexes introduced later
+    for index in student_course.indexes:
+        index.create(db.engine, checkfirst=True)
+
+
+# Enrollments are written straight to the association table. Going through
+# student.courses loads the student's whole course list to check membership
+# and to append or remove one course.
+def insert_enrollments(rows):
+    """Insert student_course rows, skipping pairs that already exist; returns how many were inserted."""
+    return insert_ignoring_duplicates(db, student_course, rows)
 
 
 # API endpoint to demonstrate Many-to-Many JOIN (Get all students with their courses)
@@ -142,10 +163,10 @@ def enroll_student_in_course(student_id, course_id):
     if not student or not course:
         abort(404, 'Student or Course not found')
 
-    # Enroll student in the course (many-to-many relationship)
-    if course not in student.courses:
-        student.courses.append(course)
-        db.session.commit()
+    # Enroll student in the course (many-to-many relationship); the primary key
+    # makes an existing enrollment a no-op
+    insert_enrollments([{'student_id': student.id, 'course_id': course.id}])
+    db.session.commit()
 
     return jsonify({'student_id': student.id, 'student_name': student.name, 'course_id': course.id,
                     'course_name': course.name}), 200
@@ -160,13 +181,42 @@ def disenroll_student_from_course(student_id, course_id):
         abort(404, 'Student or Course not found')
 
     # Disenroll student from the course
-    if course in student.courses:
-        student.courses.remove(course)
-        db.session.commit()
+    db.session.execute(student_course.delete().where(student_course.c.student_id == student.id,
+                                                     student_course.c.course_id == course.id))
+    db.session.commit()
 
     return jsonify({'message': 'Student disenrolled from course successfully'}), 200
 
 
+# API endpoint to enroll a list of students in a course at once (course roster)
+@app.route('/courses/<int:course_id>/students', methods=['POST'])
+def enroll_students_in_course(course_id):
+    course = Course.query.get(course_id)
+    if not course:
+        abort(404, 'Course not found')
+
+    data = request.get_json()
+    student_ids = data.get('student_ids') if isinstance(data, dict) else None
+    if not isinstance(student_ids, list) or not all(type(student_id) is int for student_id in student_ids):
+        abort(400, 'student_ids must be a list of student IDs')
+    student_ids = list(dict.fromkeys(student_ids))
+
+    # Check that all students exist with one IN query per chunk
+    found = set()
+    for start in range(0, len(student_ids), INSERT_CHUNK_SIZE):
+        chunk = student_ids[start:start + INSERT_CHUNK_SIZE]
+        found.update(student_id for (student_id,) in db.session.query(Student.id).filter(Student.id.in_(chunk)))
+    missing = [student_id for student_id in student_ids if student_id not in found]
+    if missing:
+        abort(404, f"Students not found: {', '.join(map(str, missing))}")
+
+    enrolled = insert_enrollments([{'student_id': student_id, 'course_id': course.id} for student_id in student_ids])
+    db.session.commit()
+
+    return jsonify({'course_id': course.id, 'course_name': course.name, 'enrolled': enrolled,
+                    'already_enrolled': len(student_ids) - enrolled}), 200
+
+
 # API endpoint to demonstrate GROUP BY (many-to-many)
 @app.route('/courses_student_count', methods=['GET'])
 def courses_student_count():
@@ -211,31 +261,22 @@ def courses_student_count_having():
 
 
 # API endpoint to demonstrate HAVING clause and list all students enrolled in a course (many-to-many)
+# ?students_limit=N&students_offset=M returns one page of each course's students (ordered by name)
 @app.route('/courses_student_count_having_with_students', methods=['GET'])
 def courses_student_count_having_with_students():
     min_students = request.args.get('min_students', 1, type=int)
+    students_limit = request.args.get('students_limit', type=int)
+    students_offset = max(request.args.get('students_offset', 0, type=int), 0)
 
-    result = db.session.query(
-        Course.id.label('course_id'),
-        Course.name.label('course_name'),
-        db.func.count(student_course.c.student_id).label('student_count'),
-        db.func.group_concat(Student.name).label('student_names')  # Aggregate student names
-    ).join(student_course, Course.id == student_course.c.course_id) \
-     .join(Student, Student.id == student_course.c.student_id) \
-     .group_by(Course.id) \
+    # Courses with enough students
+    counts = db.select(
+        student_course.c.course_id,
+        db.func.count(student_course.c.student_id).label('student_count')
+    ).group_by(student_course.c.course_id) \
      .having(db.func.count(student_course.c.student_id) >= min_students) \
-     .all()
-
-    courses_with_students = []
-    for row in result:
-        courses_with_students.append({
-            'course_id': row.course_id,
-            'course_name': row.course_name,
-            'student_count': row.student_count,
-            'students': row.student_names.split(',')  # Convert comma-separated names into a list
-        })
+     .subquery()
 
-    return jsonify(courses_with_students)
+    return course_rosters(db, Course, Student, student_course, counts, students_limit, students_offset)
 
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
@@ -1,15 +1,31 @@
 # Import Flask and SQLAlchemy
-from flask import Flask, request, jsonify
+import json
+import os
+import sqlite3
+import sys
+from flask import Flask, Response, request, url_for
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import func
 
 # Create a Flask app and configure the database URI
 app = Flask(__name__)
 app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///example.db"
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+app.config["MOVIES_CACHE_TTL"] = 60  # seconds
+app.config["MOVIES_CACHE_SIZE"] = 1024  # entries kept in each worker
+app.config["MOVIES_CACHE_REDIS_URL"] = None  # e.g. "redis://localhost:6379/0" to share the cache between workers
 
 # Create a SQLAlchemy object and a database model
 db = SQLAlchemy(app)
 
+# Substring filters are served from trigram indexes (see ../substring_search.py)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from substring_search import setup_substring_search, substring_filters
+
+# Helpers shared with other chapters live in ../../common
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from common.response_cache import ResponseCache
+
 class Movie(db.Model):
   id = db.Column(db.Integer, primary_key=True)
   title = db.Column(db.String(100), nullable=False)
@@ -28,6 +44,24 @@ class Movie(db.Model):
     }
 
 
+# Query result cache for /movies
+# Many clients ask for exactly the same filter/sort/page combination, so the JSON
+# body is cached under the normalized parameters (see ../../common/response_cache.py).
+# A commit that writes to the movie table makes the old entries unreachable at
+# once, whether it comes from the ORM, bulk_insert_mappings or raw SQL.
+query_cache = ResponseCache(app.config["MOVIES_CACHE_TTL"], app.config["MOVIES_CACHE_SIZE"],
+                            app.config["MOVIES_CACHE_REDIS_URL"])
+with app.app_context():
+    query_cache.track_writes(db.engine)
+
+
+def supports_window_functions():
+    dialect = db.engine.dialect
+    if dialect.name == "sqlite":
+        return sqlite3.sqlite_version_info >= (3, 25)
+    if dialect.name == "mysql":
+        return dialect.server_version_info >= (8,)
+    return True
 
 # Define a route for the movies endpoint
 @app.route("/movies")
@@ -39,58 +73,93 @@ def movies():
     sort = request.args.get("sort", None, type=str)  # the sort column
     order = request.args.get("order", "asc", type=str)  # the sort order
 
-    # Get the movies from the database
-    movies = Movie.query
-
-    # Apply the filter if provided
-    if filter:
-        movies = movies.filter(Movie.title.contains(filter))
-
-    # Apply the sort if provided
-    if sort:
-        if sort == "title":
-            movies = movies.order_by(Movie.title.asc() if order == "asc" else Movie.title.desc())
-
-        elif sort == "year":
-            movies = movies.order_by(Movie.year.asc() if order == "asc" else Movie.year.desc())
-        elif sort == "rating":
-            movies = movies.order_by(Movie.rating.asc() if order == "asc" else Movie.rating.desc())
-
-
-    # Apply the pagination
-    movies = movies.paginate(page=page, per_page=per_page, error_out=False)
-
-    # Convert the movies to a list of dictionaries
-    movies = [movie.to_dict() for movie in movies.items]
-
-    # Return the JSON response
-    return jsonify({
-        "success": True,
-        "movies": movies,
-        "total": len(movies)
-    })
-
-
-
-
+    # Normalize the parameters so equivalent requests share a cache entry
+    page, per_page = max(page, 1), max(per_page, 1)
+    if sort not in ("title", "year", "rating"):
+        sort = None
+    order = ("asc" if order == "asc" else "desc") if sort else None
+    search = filter.lower() if filter else None
+    page_key = query_cache.key(("movie",), [page, per_page, search, sort, order])
+    # The total only depends on the filter, so all pages share one count entry
+    count_key = query_cache.key(("movie",), ["count", search])
+
+    def filtered_movies():
+        # Get the movies from the database
+        movies = Movie.query
+
+        # Apply the filter if provided
+        if filter:
+            movies = movies.filter(*substring_filters(Movie, {"title": filter}))
+        return movies
+
+    def count_movies():
+        return str(filtered_movies().order_by(None).count())
+
+    def query_movies():
+        movies = filtered_movies()
+
+        # Apply the sort if provided
+        if sort:
+            sort_column = getattr(Movie, sort)
+            movies = movies.order_by(sort_column.asc() if order == "asc" else sort_column.desc())
+
+        # Apply the pagination, reading the total from the same statement when the database can
+        movies = movies.limit(per_page).offset((page - 1) * per_page)
+        if supports_window_functions():
+            rows = movies.add_columns(func.count().over()).all()
+            items = [movie for movie, _ in rows]
+            if rows:
+                query_cache.set(count_key, str(rows[0][1]))
+        else:
+            items = movies.all()
+        total = int(query_cache.get_or_compute(count_key, count_movies))
+
+        # Serialize the JSON response once; the cache keeps the text
+        return json.dumps({
+            "success": True,
+            "movies": [movie.to_dict() for movie in items],
+            "total": total,
+            "page": page,
+            "per_page": per_page,
+            "pages": -(-total // per_page)
+        })
+
+    response = Response(query_cache.get_or_compute(page_key, query_movies), mimetype="application/json")
+
+    # Link headers let clients walk the pages without requesting past the end
+    pages = -(-int(query_cache.get_or_compute(count_key, count_movies)) // per_page)
+    links = {"first": 1, "last": max(pages, 1)}
+    if page < pages:
+        links["next"] = page + 1
+    if 1 < page <= pages + 1:
+        links["prev"] = page - 1
+    response.headers["Link"] = ", ".join(
+        f'<{url_for("movies", _external=True, **{**request.args.to_dict(), "page": number})}>; rel="{rel}"'
+        for rel, number in links.items()
+    )
+    return response
 
 
 # Run the app
 if __name__ == "__main__":
     with app.app_context():
-        # Create some sample data
-        db.drop_all()
         db.create_all()
-        db.session.add(Movie(title="The Godfather", year=1972, rating=9.2))
-        db.session.add(Movie(title="The Shawshank Redemption", year=1994, rating=9.3))
-        db.session.add(Movie(title="The Dark Knight", year=2008, rating=9.0))
-        db.session.add(Movie(title="The Matrix", year=1999, rating=8.7))
-        db.session.add(Movie(title="Inception", year=2010, rating=8.8))
-        db.session.add(Movie(title="The Lord of the Rings: The Return of the King", year=2003, rating=8.9))
-        db.session.add(Movie(title="The Lion King", year=1994, rating=8.5))
-        db.session.add(Movie(title="The Avengers", year=2012, rating=8.0))
-        db.session.add(Movie(title="Titanic", year=1997, rating=7.8))
-        db.session.add(Movie(title="Avatar", year=2009, rating=7.8))
+        setup_substring_search(db, Movie, ("title",))
+        # Create some sample data, skipping movies that are already there
+        sample_movies = [
+            dict(title="The Godfather", year=1972, rating=9.2),
+            dict(title="The Shawshank Redemption", year=1994, rating=9.3),
+            dict(title="The Dark Knight", year=2008, rating=9.0),
+            dict(title="The Matrix", year=1999, rating=8.7),
+            dict(title="Inception", year=2010, rating=8.8),
+            dict(title="The Lord of the Rings: The Return of the King", year=2003, rating=8.9),
+            dict(title="The Lion King", year=1994, rating=8.5),
+            dict(title="The Avengers", year=2012, rating=8.0),
+            dict(title="Titanic", year=1997, rating=7.8),
+            dict(title="Avatar", year=2009, rating=7.8),
+        ]
+        existing_titles = {title for (title,) in db.session.query(Movie.title)}
+        db.session.bulk_insert_mappings(Movie, [movie for movie in sample_movies if movie["title"] not in existing_titles])
         db.session.commit()
     app.run(debug=True)
 
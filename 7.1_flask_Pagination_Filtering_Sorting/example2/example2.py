@@ -1,11 +1,19 @@
+import base64
+import json
+import os
+import sys
 from flask import Flask, request, jsonify
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import inspect
+from sqlalchemy import inspect, tuple_
 
 app = Flask(__name__)
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///books.db'
 db = SQLAlchemy(app)
 
+# Substring filters are served from trigram indexes (see ../substring_search.py)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from substring_search import setup_substring_search, substring_filters
+
 # Define the Book model
 class Book(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -22,6 +30,43 @@ class Book(db.Model):
 # Create the database tables
 db.create_all()
 
+
+setup_substring_search(db, Book, ('title', 'author', 'genre'))
+
+
+# Sort registry
+# Each model declares the columns it may be sorted by. Every key is indexed
+# together with id, which breaks ties, so an ordered page is an index range scan
+# and a keyset cursor (last sort value, last id) seeks straight to the next page
+# instead of skipping OFFSET rows.
+SORT_KEYS = {}
+
+
+def register_sort_keys(model, keys):
+    SORT_KEYS[model] = ('id',) + tuple(keys)
+    for key in keys:
+        index = db.Index(f'ix_{model.__tablename__}_{key}_id', getattr(model, key), model.id)
+        index.create(db.engine, checkfirst=True)
+
+
+def encode_cursor(sort_by, values):
+    return base64.urlsafe_b64encode(json.dumps([sort_by, *values]).encode()).decode()
+
+
+def decode_cursor(sort_by, cursor, size):
+    try:
+        cursor_sort_by, *values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+    if cursor_sort_by != sort_by:
+        raise ValueError('Cursor was issued for a different sort_by')
+    if len(values) != size:
+        raise ValueError('Invalid cursor')
+    return values
+
+
+register_sort_keys(Book, ('title', 'author', 'genre'))
+
 # Create some sample data
 sample_data = [
     {"title": "Book 1", "author": "Author 1", "genre": "Fiction"},
@@ -30,10 +75,9 @@ sample_data = [
     # Add more books here
 ]
 
-for data in sample_data:
-    book = Book(**data)
-    db.session.add(book)
-
+# Only insert the books that are not there yet, so restarts do not duplicate them
+existing_titles = {title for (title,) in db.session.query(Book.title)}
+db.session.bulk_insert_mappings(Book, [data for data in sample_data if data["title"] not in existing_titles])
 db.session.commit()
 
 # Pagination parameters
@@ -45,6 +89,8 @@ def get_books():
     # Pagination
     page = int(request.args.get('page', DEFAULT_PAGE))
     page_size = int(request.args.get('page_size', DEFAULT_PAGE_SIZE))
+    if page < 1 or page_size < 1:
+        return jsonify({'error': 'page and page_size must be positive'}), 400
     start_index = (page - 1) * page_size
     end_index = start_index + page_size
 
@@ -52,32 +98,39 @@ def get_books():
     query = Book.query
 
     # Filtering
-    title = request.args.get('title')
-    if title:
-        query = query.filter(Book.title.ilike(f'%{title}%'))
-    author = request.args.get('author')
-    if author:
-        query = query.filter(Book.author.ilike(f'%{author}%'))
-    genre = request.args.get('genre')
-    if genre:
-        query = query.filter(Book.genre.ilike(f'%{genre}%'))
+    terms = {column: request.args.get(column) for column in ('title', 'author', 'genre')}
+    query = query.filter(*substring_filters(Book, {column: term for column, term in terms.items() if term}))
 
     # Sorting
-    sort_by = request.args.get('sort_by')
-    if sort_by:
-        if sort_by.startswith('-'):
-            sort_by = sort_by[1:]
-            query = query.order_by(getattr(Book, sort_by).desc())
-        else:
-            query = query.order_by(getattr(Book, sort_by))
-
-    # Paginate the filtered and sorted books
-    books = query.slice(start_index, end_index).all()
+    sort_by = request.args.get('sort_by', 'id')
+    descending = sort_by.startswith('-')
+    sort_key = sort_by.lstrip('-')
+    if sort_key not in SORT_KEYS[Book]:
+        return jsonify({'error': f"sort_by must be one of {', '.join(SORT_KEYS[Book])}"}), 400
+    sort_columns = (Book.id,) if sort_key == 'id' else (getattr(Book, sort_key), Book.id)
+    query = query.order_by(*(column.desc() if descending else column for column in sort_columns))
+
+    # Paginate the filtered and sorted books, seeking past the cursor when one is given
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            last_values = decode_cursor(sort_by, cursor, len(sort_columns))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        position = tuple_(*sort_columns)
+        query = query.filter(position < tuple_(*last_values) if descending else position > tuple_(*last_values))
+        books = query.limit(page_size + 1).all()
+    else:
+        books = query.slice(start_index, end_index + 1).all()
 
     # Serialize books to dictionary format
-    books_json = [book.to_dict() for book in books]
+    books_json = [book.to_dict() for book in books[:page_size]]
 
-    return jsonify(books_json)
+    response = jsonify(books_json)
+    if len(books) > page_size:
+        last = books[page_size - 1]
+        response.headers['X-Next-Cursor'] = encode_cursor(sort_by, [getattr(last, column.key) for column in sort_columns])
+    return response
 
 if __name__ == '__main__':
     app.run(debug=True)
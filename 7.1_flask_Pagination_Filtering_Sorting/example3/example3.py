@@ -1,14 +1,38 @@
 import logging
-from flask import Flask, jsonify, request
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from flask import Flask, g, has_request_context, jsonify, request
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 from sqlalchemy.exc import SQLAlchemyError
+from prometheus_client import Histogram
 from prometheus_flask_exporter import PrometheusMetrics
 
 app = Flask(__name__)
 metrics = PrometheusMetrics(app)
 
+# Helpers shared with other chapters live in ../../common
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from common.log_pipeline import setup_logging
+from common.pagination import COUNT_MODES, CountingPaginator
+
+# Substring filters are served from trigram indexes (see ../substring_search.py)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from substring_search import setup_substring_search, substring_filters
+
 # Configure logging
-logging.basicConfig(filename='app.log', level=logging.DEBUG)
+# Records are written to app.log by a background thread (see ../../common/log_pipeline.py)
+
+app.config['LOG_FILE'] = 'app.log'
+app.config['LOG_LEVEL'] = 'DEBUG'
+app.config['LOG_ASYNC'] = True  # False writes each record from the request thread
+setup_logging(app)
 
 # Initialize SQLAlchemy
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///books.db'
@@ -33,6 +57,98 @@ class Book(db.Model):
 # Create database tables
 db.create_all()
 
+setup_substring_search(db, Book, ('title', 'author', 'genre'))
+
+# Phase timings
+# PrometheusMetrics only times whole requests. phase() times one step of a
+# request; the timings, and every SQL statement run meanwhile, are collected on
+# flask.g and reported to a histogram labeled by endpoint and phase when the
+# request ends. Requests slower than SLOW_REQUEST_SECONDS attach their request id
+# as an exemplar (exposed in the OpenMetrics format), and the SQL they ran can be
+# read back from /debug/slow_requests/<request_id> when the app runs in debug mode.
+app.config['SLOW_REQUEST_SECONDS'] = 0.5
+SLOW_REQUESTS_KEPT = 100
+
+PHASE_SECONDS = Histogram('http_request_phase_duration_seconds', 'Time spent in each phase of a request',
+                          ['endpoint', 'phase'])
+slow_requests = OrderedDict()
+_slow_requests_lock = threading.Lock()
+
+
+@contextmanager
+def phase(name):
+    if not has_request_context():
+        yield
+        return
+    outer, g.current_phase = g.get('current_phase'), name
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        g.phases.append((name, time.perf_counter() - started))
+        g.current_phase = outer
+
+
+@app.before_request
+def start_phase_timing():
+    g.request_started = time.perf_counter()
+    g.phases = []
+    g.statements = []
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _start_statement_timer(conn, cursor, statement, parameters, context, executemany):
+    # Kept on the statement's own execution context: a statement that raises
+    # never reaches after_cursor_execute and its start time goes away with it
+    context.statement_started = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _capture_statement(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context.statement_started
+    if has_request_context() and 'statements' in g:
+        g.statements.append({'phase': g.get('current_phase'), 'seconds': round(elapsed, 6), 'sql': statement})
+
+
+@app.after_request
+def report_phase_timing(response):
+    if 'request_started' not in g:
+        return response
+    duration = time.perf_counter() - g.request_started
+    exemplar = None
+    if duration >= app.config['SLOW_REQUEST_SECONDS']:
+        request_id = uuid.uuid4().hex
+        exemplar = {'request_id': request_id}
+        with _slow_requests_lock:
+            slow_requests[request_id] = {
+                'endpoint': request.endpoint,
+                'url': request.full_path,
+                'seconds': round(duration, 6),
+                'phases': [{'phase': name, 'seconds': round(seconds, 6)} for name, seconds in g.phases],
+                'statements': g.statements,
+            }
+            while len(slow_requests) > SLOW_REQUESTS_KEPT:
+                slow_requests.popitem(last=False)
+        response.headers['X-Request-Id'] = request_id
+    for name, seconds in g.phases:
+        PHASE_SECONDS.labels(request.endpoint, name).observe(seconds, exemplar=exemplar)
+    return response
+
+
+@app.route('/debug/slow_requests/<request_id>', methods=['GET'])
+def get_slow_request(request_id):
+    if not app.debug:
+        return jsonify({'error': 'Not found'}), 404
+    with _slow_requests_lock:
+        slow_request = slow_requests.get(request_id)
+    if slow_request is None:
+        return jsonify({'error': 'Unknown or expired request id'}), 404
+    return jsonify(slow_request), 200
+
+
+# Totals are cached per filter signature, estimated or skipped (?count=)
+paginator = CountingPaginator(app, db, phase=phase)
+
 # Routes
 @app.route('/books', methods=['GET'])
 def get_books():
@@ -42,24 +158,27 @@ def get_books():
         title = request.args.get('title', '')
         author = request.args.get('author', '')
         genre = request.args.get('genre', '')
+        count_mode = request.args.get('count', 'exact')
+        if count_mode not in COUNT_MODES:
+            return jsonify({'error': f"count must be one of {', '.join(COUNT_MODES)}"}), 400
 
-        query = Book.query
+        with phase('filter'):
+            query = Book.query
 
-        if title:
-            query = query.filter(Book.title.ilike(f'%{title}%'))
-        if author:
-            query = query.filter(Book.author.ilike(f'%{author}%'))
-        if genre:
-            query = query.filter(Book.genre.ilike(f'%{genre}%'))
+            terms = {'title': title, 'author': author, 'genre': genre}
+            query = query.filter(*substring_filters(Book, {column: term for column, term in terms.items() if term}))
 
-        books = query.paginate(page, page_size, False)
+        signature = tuple((name, value.lower()) for name, value in
+                          (('title', title), ('author', author), ('genre', genre)) if value)
+        books = paginator.paginate(query, page, page_size, count_mode, signature, (Book,))
 
-        return jsonify({
-            'books': [book.serialize() for book in books.items],
-            'total_books': books.total,
-            'total_pages': books.pages,
-            'current_page': books.page
-        }), 200
+        with phase('serialize'):
+            return jsonify({
+                'books': [book.serialize() for book in books.items],
+                'total_books': books.total,
+                'total_pages': books.pages,
+                'current_page': books.page
+            }), 200
     except SQLAlchemyError as e:
         logging.error(f'Database error: {str(e)}')
         return jsonify({'error': 'Database error'}), 500
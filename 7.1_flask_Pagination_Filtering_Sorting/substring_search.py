@@ -0,0 +1,63 @@
+"""Indexed substring search for the 7.1 examples.
+
+ilike('%x%') cannot use a B-tree index, so every filtered request scans the
+whole table. On SQLite the searchable columns are mirrored into an FTS5 table
+using the trigram tokenizer (kept in sync by triggers) and LIKE on that table is
+answered from the trigram index. On PostgreSQL a pg_trgm GIN index serves ILIKE
+directly. Terms shorter than three characters have no trigram and are matched
+with a plain scan.
+
+    setup_substring_search(db, Book, ('title', 'author', 'genre'))
+    query = query.filter(*substring_filters(Book, {'title': 'pott'}))
+"""
+from sqlalchemy import select, text
+from sqlalchemy import column as sql_column, table as sql_table
+from sqlalchemy.exc import OperationalError
+
+_trigram_tables = {}
+
+
+def setup_substring_search(db, model, columns):
+    """Create the trigram index (or FTS5 mirror) serving substring filters on `columns`."""
+    table = model.__tablename__
+    dialect = db.engine.dialect.name
+    with db.engine.begin() as conn:
+        if dialect == 'postgresql':
+            conn.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+            for column in columns:
+                conn.execute(text(f'CREATE INDEX IF NOT EXISTS ix_{table}_{column}_trgm ON {table} USING gin ({column} gin_trgm_ops)'))
+        elif dialect == 'sqlite':
+            fts = f'{table}_fts'
+            names = ', '.join(columns)
+            new_values = ', '.join(f'new.{column}' for column in columns)
+            old_values = ', '.join(f'old.{column}' for column in columns)
+            exists = conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = :name"), {'name': fts}).scalar()
+            try:
+                conn.execute(text(f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({names}, content='{table}', content_rowid='id', tokenize='trigram')"))
+            except OperationalError:
+                # SQLite older than 3.34 has no trigram tokenizer
+                return
+            conn.execute(text(f"""CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN
+                INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {new_values});
+            END"""))
+            conn.execute(text(f"""CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN
+                INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.id, {old_values});
+            END"""))
+            conn.execute(text(f"""CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {table} BEGIN
+                INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.id, {old_values});
+                INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {new_values});
+            END"""))
+            if not exists:
+                conn.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+            _trigram_tables[table] = sql_table(fts, sql_column('rowid'), *(sql_column(column) for column in columns))
+
+
+def substring_filters(model, terms):
+    """Turn {column: term} into WHERE clauses for rows whose column contains term."""
+    fts = _trigram_tables.get(model.__tablename__)
+    indexed = {column: term for column, term in terms.items() if fts is not None and len(term) >= 3}
+    clauses = [getattr(model, column).ilike(f'%{term}%') for column, term in terms.items() if column not in indexed]
+    if indexed:
+        matches = select(fts.c.rowid).where(*(fts.c[column].like(f'%{term}%') for column, term in indexed.items()))
+        clauses.append(model.id.in_(matches))
+    return clauses
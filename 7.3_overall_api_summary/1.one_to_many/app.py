@@ -1,6 +1,17 @@
-from flask import Flask, jsonify, request
+import base64
+import codecs
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from flask import Flask, jsonify, request, url_for
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import or_, and_, desc
+from sqlalchemy import or_, and_, desc, func, insert
 
 app = Flask(__name__)
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///example.db'  # SQLite database
@@ -9,9 +20,20 @@ app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///example.db'  # SQLite databas
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 db = SQLAlchemy(app)
 
+# Helpers shared with other chapters live in ../../common
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from common.pagination import COUNT_MODES, CountingPaginator, Page
+
+# Bulk helpers shared by both 7.3 apps (see ../bulk_helpers.py)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from bulk_helpers import BULK_CHUNK_SIZE, chunks, missing_ids
+
 
 # Define the Author model
 class Author(db.Model):
+    # (name, id) serves name filters, name prefixes and the author_name sort
+    __table_args__ = (db.Index('ix_author_name_id', 'name', 'id'),)
+
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(50), nullable=False)
     books = db.relationship('Book', backref='author', lazy=True)
@@ -22,6 +44,13 @@ class Author(db.Model):
 
 # Define the Book model
 class Book(db.Model):
+    # (author_id, title) serves the join from authors (and the foreign key) with
+    # the title at hand; (title, id) serves title prefixes and the book_title sort
+    __table_args__ = (
+        db.Index('ix_book_author_id_title', 'author_id', 'title'),
+        db.Index('ix_book_title_id', 'title', 'id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
     author_id = db.Column(db.Integer, db.ForeignKey('author.id'), nullable=False)
@@ -30,9 +59,311 @@ class Book(db.Model):
         return f"<Book {self.title}>"
 
 
+# Progress of a bulk operation started with ?async=1
+class Job(db.Model):
+    id = db.Column(db.String(32), primary_key=True, default=lambda: uuid.uuid4().hex)
+    operation = db.Column(db.String(20), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    bytes_total = db.Column(db.Integer, nullable=False, default=0)
+    bytes_read = db.Column(db.Integer, nullable=False, default=0)
+    chunks_done = db.Column(db.Integer, nullable=False, default=0)
+    items_succeeded = db.Column(db.Integer, nullable=False, default=0)
+    items_failed = db.Column(db.Integer, nullable=False, default=0)
+    errors = db.Column(db.Text, nullable=False, default='[]')
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'operation': self.operation,
+            'status': self.status,
+            'progress': round(self.bytes_read / self.bytes_total, 4) if self.bytes_total else 1.0,
+            'chunks_done': self.chunks_done,
+            'items_succeeded': self.items_succeeded,
+            'items_failed': self.items_failed,
+            'errors': json.loads(self.errors),
+            'created_at': self.created_at.isoformat(),
+            'updated_at': self.updated_at.isoformat(),
+        }
+
+
 # Create the database
 with app.app_context():
     db.create_all()
+    # create_all() skips tables that already exist, so add indexes introduced later
+    for model in (Author, Book):
+        for index in model.__table__.indexes:
+            index.create(db.engine, checkfirst=True)
+
+# Totals are cached per filter signature, estimated or skipped (?count=)
+paginator = CountingPaginator(app, db)
+
+
+def insert_returning_ids(model, rows):
+    """Insert rows in batched INSERT statements and return their new ids in order."""
+    dialect = db.engine.dialect
+    if dialect.name == 'sqlite':
+        # A plain executemany is the fastest insert. It takes SQLite's write lock
+        # until the commit, so the new rows are the last len(rows) ids
+        db.session.execute(insert(model), rows)
+        last_id = db.session.query(func.max(model.id)).scalar()
+        return list(range(last_id - len(rows) + 1, last_id + 1))
+    if getattr(dialect, 'insert_executemany_returning_sort_by_parameter_order', False):
+        # SQLAlchemy 2.0 batches these into multi-row INSERT ... RETURNING
+        # statements and keeps the order
+        statement = insert(model).returning(model.id, sort_by_parameter_order=True)
+        return db.session.execute(statement, rows).scalars().all()
+
+    ids = []
+    for chunk in chunks(rows, max(1, BULK_CHUNK_SIZE // len(rows[0]))):
+        statement = insert(model).values(chunk)
+        if dialect.name == 'postgresql':
+            ids.extend(db.session.execute(statement.returning(model.id)).scalars())
+        else:
+            # The rows of one statement get consecutive ids and MySQL reports the first
+            first_id = db.session.execute(statement).lastrowid
+            ids.extend(range(first_id, first_id + len(chunk)))
+    return ids
+
+
+# Request bodies of bulk creates can be hundreds of MB, so they are parsed while
+# they are read instead of with request.get_json(). Both a JSON array and
+# newline-delimited JSON (Content-Type: application/x-ndjson) are accepted.
+STREAM_READ_SIZE = 64 * 1024
+
+
+class MalformedBody(ValueError):
+    """Raised by the body parsers only, so errors while processing items are not taken for a bad body."""
+
+
+def iter_json_array(stream):
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    buffer, position, state = '', 0, 'open'
+    while True:
+        data = stream.read(STREAM_READ_SIZE)
+        try:
+            buffer = buffer[position:] + utf8.decode(data, final=not data)
+        except UnicodeDecodeError:
+            raise MalformedBody('invalid UTF-8')
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position].isspace():
+                position += 1
+            if position == len(buffer):
+                break
+            char = buffer[position]
+            if state == 'open':
+                if char != '[':
+                    raise MalformedBody('not a list')
+                position, state = position + 1, 'first'
+            elif state == 'first' and char == ']':
+                position, state = position + 1, 'closed'
+            elif state in ('first', 'item'):
+                try:
+                    item, end = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    if data:
+                        break  # the item continues in the next read
+                    raise MalformedBody('invalid JSON')
+                if end == len(buffer) and data:
+                    break  # a number could still be cut off; decode it again with more data
+                yield item
+                position, state = end, 'separator'
+            elif state == 'separator' and char in ',]':
+                position, state = position + 1, 'item' if char == ',' else 'closed'
+            else:
+                raise MalformedBody('invalid JSON')
+        if not data:
+            if state != 'closed':
+                raise MalformedBody('not a list')
+            return
+
+
+def iter_ndjson(stream):
+    for line in iter(stream.readline, b''):
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except ValueError:
+                raise MalformedBody('invalid JSON')
+
+
+def iter_body_items(stream, mimetype):
+    if mimetype in ('application/x-ndjson', 'application/jsonl'):
+        return iter_ndjson(stream)
+    return iter_json_array(stream)
+
+
+def iter_batches(items, size=BULK_CHUNK_SIZE):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class BulkError(Exception):
+    def __init__(self, message, status=400, missing=None):
+        super().__init__(message)
+        self.status = status
+        self.missing = missing
+
+    def to_dict(self):
+        data = {"message": str(self)}
+        if self.missing:
+            data["missing_ids"] = self.missing
+        return data
+
+
+# Each operation handles one batch of at most BULK_CHUNK_SIZE items in the
+# current transaction, for the synchronous endpoints and for jobs alike
+def create_authors(batch):
+    rows = []
+    for author_data in batch:
+        author_name = author_data.get('name') if isinstance(author_data, dict) else None
+        if not author_name:
+            raise BulkError("Each author must have a 'name' field")
+        rows.append({'name': author_name})
+    return insert_returning_ids(Author, rows)
+
+
+def create_books(batch):
+    rows = []
+    for book_data in batch:
+        if not isinstance(book_data, dict) or not book_data.get('title') or not book_data.get('author_id'):
+            raise BulkError("Each book must have 'title' and 'author_id' fields")
+        rows.append({'title': book_data['title'], 'author_id': book_data['author_id']})
+
+    # One lookup per batch instead of waiting for the commit to fail
+    missing = missing_ids(db.session, Author, [row['author_id'] for row in rows])
+    if missing:
+        raise BulkError(f"Author with ID {missing[0]} not found", 404, missing)
+    return insert_returning_ids(Book, rows)
+
+
+def update_authors(batch):
+    mappings = []
+    for author_data in batch:
+        if not isinstance(author_data, dict) or not author_data.get('id') or not author_data.get('name'):
+            raise BulkError("Each author must have 'id' and 'name' fields")
+        mappings.append({'id': author_data['id'], 'name': author_data['name']})
+
+    # Check all IDs exist with one IN query instead of one SELECT per author
+    missing = missing_ids(db.session, Author, [mapping['id'] for mapping in mappings])
+    if missing:
+        raise BulkError(f"Author with ID {missing[0]} not found", 404, missing)
+    db.session.bulk_update_mappings(Author, mappings)
+    return len(mappings)
+
+
+def update_books(batch):
+    mappings = []
+    for book_data in batch:
+        if not isinstance(book_data, dict) or not book_data.get('id') or not book_data.get('title') \
+                or not book_data.get('author_id'):
+            raise BulkError("Each book must have 'id', 'title', and 'author_id' fields")
+        mappings.append({'id': book_data['id'], 'title': book_data['title'], 'author_id': book_data['author_id']})
+
+    # Check all book and author IDs exist with one IN query each
+    missing = missing_ids(db.session, Book, [mapping['id'] for mapping in mappings])
+    if missing:
+        raise BulkError(f"Book with ID {missing[0]} not found", 404, missing)
+    missing = missing_ids(db.session, Author, [mapping['author_id'] for mapping in mappings])
+    if missing:
+        raise BulkError(f"Author with ID {missing[0]} not found", 404, missing)
+    db.session.bulk_update_mappings(Book, mappings)
+    return len(mappings)
+
+
+BULK_OPERATIONS = {
+    'create_authors': create_authors,
+    'create_books': create_books,
+    'update_authors': update_authors,
+    'update_books': update_books,
+}
+
+
+# Bulk jobs
+# With ?async=1 the request body is spooled to a temporary file and the endpoint
+# answers 202 with a job id right away. A small worker pool processes the file
+# chunk by chunk, committing each chunk and the job's progress together, so an
+# import keeps going when the client disconnects and a bad chunk is reported in
+# the job's errors instead of failing the whole import. Jobs run inside this
+# process: a restart leaves unfinished jobs in 'queued' or 'running'.
+BULK_JOB_WORKERS = 2
+JOB_MAX_ERRORS = 100
+
+bulk_job_pool = ThreadPoolExecutor(max_workers=BULK_JOB_WORKERS, thread_name_prefix='bulk-job')
+
+
+def wants_async():
+    return request.args.get('async', '').lower() in ('1', 'true', 'yes')
+
+
+def start_bulk_job(operation):
+    with tempfile.NamedTemporaryFile(prefix='bulk-job-', delete=False) as spool:
+        shutil.copyfileobj(request.stream, spool, STREAM_READ_SIZE)
+
+    job = Job(operation=operation, bytes_total=os.path.getsize(spool.name))
+    db.session.add(job)
+    db.session.commit()
+
+    bulk_job_pool.submit(run_bulk_job, job.id, spool.name, request.mimetype)
+    return jsonify(job.to_dict()), 202, {'Location': url_for('get_job', id=job.id)}
+
+
+def run_bulk_job(job_id, path, mimetype):
+    with app.app_context():
+        job = db.session.get(Job, job_id)
+        process = BULK_OPERATIONS[job.operation]
+        errors = []
+        job.status = 'running'
+        db.session.commit()
+        try:
+            with open(path, 'rb') as body:
+                for number, batch in enumerate(iter_batches(iter_body_items(body, mimetype))):
+                    try:
+                        process(batch)
+                        job.items_succeeded += len(batch)
+                    except BulkError as error:
+                        db.session.rollback()
+                        job.items_failed += len(batch)
+                        if len(errors) < JOB_MAX_ERRORS:
+                            errors.append({"chunk": number, "first_item": number * BULK_CHUNK_SIZE, **error.to_dict()})
+                            job.errors = json.dumps(errors)
+                    job.chunks_done += 1
+                    job.bytes_read = body.tell()
+                    db.session.commit()
+            job.status = 'completed_with_errors' if job.items_failed else 'completed'
+        except MalformedBody:
+            db.session.rollback()
+            job.status = 'failed'
+            errors.append({"chunk": job.chunks_done, "message": "Request body must be a JSON list or NDJSON"})
+            job.errors = json.dumps(errors)
+        except Exception:
+            logging.getLogger(__name__).exception("Bulk job %s failed", job_id)
+            db.session.rollback()
+            job.status = 'failed'
+            errors.append({"chunk": job.chunks_done, "message": "Internal error"})
+            job.errors = json.dumps(errors)
+        finally:
+            try:
+                db.session.commit()
+            finally:
+                os.remove(path)
+
+
+@app.route('/jobs/<id>', methods=['GET'])
+def get_job(id):
+    job = db.session.get(Job, id)
+    if not job:
+        return jsonify({"message": "Job not found"}), 404
+    return jsonify(job.to_dict())
 
 
 # Create Author API (Create Operation)
@@ -65,6 +396,57 @@ def create_book():
 
 
 # Read Authors and Books with Pagination, Sorting, and Filtering (Read Operation)
+# Seek pagination for /search
+# OFFSET makes the database produce and throw away every row before the page,
+# so deep pages get slower as the tables grow. A cursor holds the sort value and
+# the book id of the last row and the next page starts right after it, walking
+# the (name, id) and (title, id) indexes.
+def encode_cursor(sort_by, sort_order, values):
+    return base64.urlsafe_b64encode(json.dumps([sort_by, sort_order, *values]).encode()).decode()
+
+
+def decode_cursor(sort_by, sort_order, cursor):
+    try:
+        cursor_sort_by, cursor_sort_order, *values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+    if cursor_sort_by != sort_by or cursor_sort_order != sort_order or len(values) != 2:
+        raise ValueError('Cursor was issued for a different sort_by or sort_order')
+    return values
+
+
+def seek_after(column, tiebreaker, values, descending):
+    # Equivalent to (column, tiebreaker) > (value, last_id), with a plain range
+    # on the leading column that an index can start from
+    value, last_id = values
+    if descending:
+        return and_(column <= value, or_(column < value, tiebreaker < last_id))
+    return and_(column >= value, or_(column > value, tiebreaker > last_id))
+
+
+def prefix_filter(column, prefix):
+    # SQLite ignores the index for LIKE 'prefix%' because its LIKE is
+    # case-insensitive, so there the prefix becomes a case-sensitive range. The
+    # range only matches the prefix under a binary collation, which is SQLite's
+    # default but not PostgreSQL's or MySQL's; they keep LIKE, which MySQL and
+    # PostgreSQL with a C collation or text_pattern_ops index serve from an index
+    if db.engine.dialect.name != 'sqlite':
+        escaped = prefix.replace('/', '//').replace('%', '/%').replace('_', '/_')
+        return column.like(f'{escaped}%', escape='/')
+    # Trailing U+10FFFF cannot be incremented, and a prefix made only of it
+    # needs no upper bound: every string from it on starts with it
+    stem = prefix.rstrip(chr(sys.maxunicode))
+    if not stem:
+        return column >= prefix
+    code = ord(stem[-1]) + 1
+    if 0xD800 <= code <= 0xDFFF:
+        code = 0xE000  # surrogates cannot be encoded to send as a parameter
+    return and_(column >= prefix, column < stem[:-1] + chr(code))
+
+
+SEARCH_MATCH_MODES = ('contains', 'prefix')
+
+
 @app.route('/search', methods=['GET'])
 def search():
     author_name = request.args.get('author_name', None)
@@ -73,18 +455,33 @@ def search():
     per_page = int(request.args.get('per_page', 10))
     sort_by = request.args.get('sort_by', 'author_name')
     sort_order = request.args.get('sort_order', 'asc')
+    count_mode = request.args.get('count', 'exact')
+    match = request.args.get('match', 'contains')
+    cursor = request.args.get('cursor')
+
+    if count_mode not in COUNT_MODES:
+        return jsonify({"message": f"count must be one of {', '.join(COUNT_MODES)}"}), 400
+    if match not in SEARCH_MATCH_MODES:
+        return jsonify({"message": f"match must be one of {', '.join(SEARCH_MATCH_MODES)}"}), 400
 
     query = db.session.query(Author, Book).join(Book, Author.id == Book.author_id)
 
+    # contains uses LIKE '%...%', which has to look at every row; prefix can use the indexes
+    if match == 'prefix':
+        text_filter = prefix_filter
+    else:
+        def text_filter(column, term):
+            return column.like(f'%{term}%')
+
     if author_name and book_title:
         query = query.filter(and_(
-            Author.name.like(f'%{author_name}%'),
-            Book.title.like(f'%{book_title}%')
+            text_filter(Author.name, author_name),
+            text_filter(Book.title, book_title)
         ))
     elif author_name:
-        query = query.filter(Author.name.like(f'%{author_name}%'))
+        query = query.filter(text_filter(Author.name, author_name))
     elif book_title:
-        query = query.filter(Book.title.like(f'%{book_title}%'))
+        query = query.filter(text_filter(Book.title, book_title))
     else:
         query = query
         # query = query.filter(or_(
@@ -92,18 +489,25 @@ def search():
         #     Book.title.like(f'%{book_title}%')
         # ))
 
-    if sort_by == 'book_title':
-        if sort_order == 'asc':
-            query = query.order_by(Book.title.asc())
-        elif sort_order == 'desc':
-            query = query.order_by(Book.title.desc())
+    # The book id breaks ties so every row has a fixed position for the cursor
+    sort_column = Book.title if sort_by == 'book_title' else Author.name
+    descending = sort_order == 'desc'
+    if descending:
+        query = query.order_by(sort_column.desc(), Book.id.desc())
     else:
-        if sort_order == 'asc':
-            query = query.order_by(Author.name.asc())
-        elif sort_order == 'desc':
-            query = query.order_by(Author.name.desc())
-
-    paginated_results = query.paginate(page=page, per_page=per_page, error_out=False)
+        query = query.order_by(sort_column.asc(), Book.id.asc())
+
+    if cursor:
+        try:
+            last_values = decode_cursor(sort_by, sort_order, cursor)
+        except ValueError as e:
+            return jsonify({"message": str(e)}), 400
+        rows = query.filter(seek_after(sort_column, Book.id, last_values, descending)).limit(per_page + 1).all()
+        # Cursor pages skip the count; the first page reports the total
+        paginated_results = Page(rows[:per_page], None, None, None, per_page, len(rows) > per_page)
+    else:
+        signature = (match, author_name or None, book_title or None) if author_name or book_title else ()
+        paginated_results = paginator.paginate(query, page, per_page, count_mode, signature, (Book, Author))
 
     result_list = []
     for author, book in paginated_results.items:
@@ -114,15 +518,25 @@ def search():
             'book_title': book.title
         })
 
-    return jsonify({
-        'page': page,
+    next_cursor = None
+    if paginated_results.has_next:
+        last_author, last_book = paginated_results.items[-1]
+        sort_value = last_book.title if sort_by == 'book_title' else last_author.name
+        next_cursor = encode_cursor(sort_by, sort_order, [sort_value, last_book.id])
+
+    response = jsonify({
+        'page': paginated_results.page,
         'per_page': per_page,
         'total': paginated_results.total,
         'total_pages': paginated_results.pages,
         'sort_by': sort_by,
         'sort_order': sort_order,
+        'next_cursor': next_cursor,
         'items': result_list
     })
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
 
 
 # Update Author API (Update Operation)
@@ -200,109 +614,88 @@ def delete_book(id):
 # Bulk Create Authors API
 @app.route('/authors/bulk', methods=['POST'])
 def bulk_create_authors():
-    data = request.get_json()
-
-    if not isinstance(data, list):
+    if wants_async():
+        return start_bulk_job('create_authors')
+
+    author_ids = []
+    try:
+        for batch in iter_batches(iter_body_items(request.stream, request.mimetype)):
+            author_ids.extend(create_authors(batch))
+    except BulkError as error:
+        db.session.rollback()
+        return jsonify(error.to_dict()), error.status
+    except MalformedBody:
+        db.session.rollback()
         return jsonify({"message": "Request body must be a list of authors"}), 400
 
-    authors = []
-    for author_data in data:
-        author_name = author_data.get('name')
-        if not author_name:
-            return jsonify({"message": "Each author must have a 'name' field"}), 400
-        new_author = Author(name=author_name)
-        authors.append(new_author)
-
-    db.session.bulk_save_objects(authors)
     db.session.commit()
 
-    return jsonify({"message": f"{len(authors)} authors created successfully"}), 201
+    return jsonify({"message": f"{len(author_ids)} authors created successfully", "ids": author_ids}), 201
 
 # Bulk Create Books API
 @app.route('/books/bulk', methods=['POST'])
 def bulk_create_books():
-    data = request.get_json()
-
-    if not isinstance(data, list):
+    if wants_async():
+        return start_bulk_job('create_books')
+
+    book_ids = []
+    try:
+        for batch in iter_batches(iter_body_items(request.stream, request.mimetype)):
+            book_ids.extend(create_books(batch))
+    except BulkError as error:
+        db.session.rollback()
+        return jsonify(error.to_dict()), error.status
+    except MalformedBody:
+        db.session.rollback()
         return jsonify({"message": "Request body must be a list of books"}), 400
 
-    books = []
-    for book_data in data:
-        book_title = book_data.get('title')
-        author_id = book_data.get('author_id')
-
-        if not book_title or not author_id:
-            return jsonify({"message": "Each book must have 'title' and 'author_id' fields"}), 400
-
-        new_book = Book(title=book_title, author_id=author_id)
-        books.append(new_book)
-
-    db.session.bulk_save_objects(books)
     db.session.commit()
 
-    return jsonify({"message": f"{len(books)} books created successfully"}), 201
+    return jsonify({"message": f"{len(book_ids)} books created successfully", "ids": book_ids}), 201
 
 
 # Bulk Update Authors API
 @app.route('/authors/bulk', methods=['PUT'])
 def bulk_update_authors():
-    data = request.get_json()
-
-    if not isinstance(data, list):
+    if wants_async():
+        return start_bulk_job('update_authors')
+
+    updated = 0
+    try:
+        for batch in iter_batches(iter_body_items(request.stream, request.mimetype)):
+            updated += update_authors(batch)
+    except BulkError as error:
+        db.session.rollback()
+        return jsonify(error.to_dict()), error.status
+    except MalformedBody:
+        db.session.rollback()
         return jsonify({"message": "Request body must be a list of authors"}), 400
 
-    updated_count = 0
-    for author_data in data:
-        author_id = author_data.get('id')
-        new_name = author_data.get('name')
-
-        if not author_id or not new_name:
-            return jsonify({"message": "Each author must have 'id' and 'name' fields"}), 400
-
-        # Find the author by ID
-        author = db.session.query(Author).get(author_id)
-
-        if author:
-            author.name = new_name
-            updated_count += 1
-        else:
-            return jsonify({"message": f"Author with ID {author_id} not found"}), 404
-
     db.session.commit()
 
-    return jsonify({"message": f"{updated_count} authors updated successfully"}), 200
+    return jsonify({"message": f"{updated} authors updated successfully"}), 200
 
 
 # Bulk Update Books API
 @app.route('/books/bulk', methods=['PUT'])
 def bulk_update_books():
-    data = request.get_json()
-
-    if not isinstance(data, list):
+    if wants_async():
+        return start_bulk_job('update_books')
+
+    updated = 0
+    try:
+        for batch in iter_batches(iter_body_items(request.stream, request.mimetype)):
+            updated += update_books(batch)
+    except BulkError as error:
+        db.session.rollback()
+        return jsonify(error.to_dict()), error.status
+    except MalformedBody:
+        db.session.rollback()
         return jsonify({"message": "Request body must be a list of books"}), 400
 
-    updated_count = 0
-    for book_data in data:
-        book_id = book_data.get('id')
-        new_title = book_data.get('title')
-        new_author_id = book_data.get('author_id')
-
-        if not book_id or not new_title or not new_author_id:
-            return jsonify({"message": "Each book must have 'id', 'title', and 'author_id' fields"}), 400
-
-        # Find the book by ID
-        book = db.session.query(Book).get(book_id)
-
-        if book:
-            book.title = new_title
-            book.author_id = new_author_id
-            updated_count += 1
-        else:
-            return jsonify({"message": f"Book with ID {book_id} not found"}), 404
-
     db.session.commit()
 
-    return jsonify({"message": f"{updated_count} books updated successfully"}), 200
+    return jsonify({"message": f"{updated} books updated successfully"}), 200
 
 
 # Bulk Delete Authors API
@@ -313,23 +706,22 @@ def bulk_delete_authors():
     if not isinstance(data, list):
         return jsonify({"message": "Request body must be a list of author IDs"}), 400
 
-    deleted_count = 0
-    for author_id in data:
-        if not isinstance(author_id, int):
-            return jsonify({"message": "Each author ID must be an integer"}), 400
-
-        # Find the author by ID
-        author = db.session.query(Author).get(author_id)
+    if not all(isinstance(author_id, int) for author_id in data):
+        return jsonify({"message": "Each author ID must be an integer"}), 400
 
-        if author:
-            db.session.delete(author)
-            deleted_count += 1
-        else:
-            return jsonify({"message": f"Author with ID {author_id} not found"}), 404
+    missing = missing_ids(db.session, Author, data)
+    if missing:
+        return jsonify({"message": f"Author with ID {missing[0]} not found", "missing_ids": missing}), 404
 
+    # Delete the authors' books and then the authors with one statement per chunk,
+    # without loading either into the session
+    author_ids = list(dict.fromkeys(data))
+    for chunk in chunks(author_ids):
+        db.session.query(Book).filter(Book.author_id.in_(chunk)).delete(synchronize_session=False)
+        db.session.query(Author).filter(Author.id.in_(chunk)).delete(synchronize_session=False)
     db.session.commit()
 
-    return jsonify({"message": f"{deleted_count} authors deleted successfully"}), 200
+    return jsonify({"message": f"{len(author_ids)} authors deleted successfully"}), 200
 
 
 # Bulk Delete Books API
@@ -340,23 +732,19 @@ def bulk_delete_books():
     if not isinstance(data, list):
         return jsonify({"message": "Request body must be a list of book IDs"}), 400
 
-    deleted_count = 0
-    for book_id in data:
-        if not isinstance(book_id, int):
-            return jsonify({"message": "Each book ID must be an integer"}), 400
-
-        # Find the book by ID
-        book = db.session.query(Book).get(book_id)
+    if not all(isinstance(book_id, int) for book_id in data):
+        return jsonify({"message": "Each book ID must be an integer"}), 400
 
-        if book:
-            db.session.delete(book)
-            deleted_count += 1
-        else:
-            return jsonify({"message": f"Book with ID {book_id} not found"}), 404
+    missing = missing_ids(db.session, Book, data)
+    if missing:
+        return jsonify({"message": f"Book with ID {missing[0]} not found", "missing_ids": missing}), 404
 
+    book_ids = list(dict.fromkeys(data))
+    for chunk in chunks(book_ids):
+        db.session.query(Book).filter(Book.id.in_(chunk)).delete(synchronize_session=False)
     db.session.commit()
 
-    return jsonify({"message": f"{deleted_count} books deleted successfully"}), 200
+    return jsonify({"message": f"{len(book_ids)} books deleted successfully"}), 200
 
 
 # Run the Flask app
@@ -1,13 +1,27 @@
+import os
+import re
+import sys
+import threading
+import time
 from flask import Flask, request, jsonify
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy.orm import aliased
-from sqlalchemy import or_
+from sqlalchemy.orm import aliased, selectinload
 
 app = Flask(__name__)
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///yourdatabase.db'  # Use your database URI
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 db = SQLAlchemy(app)
 
+# Helpers shared with other chapters live in ../../common
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from common.bulk_insert import insert_ignoring_duplicates
+from common.pagination import COUNT_MODES, CountingPaginator
+from common.written_tables import on_commit_writes
+
+# Bulk helpers shared by both 7.3 apps (see ../bulk_helpers.py)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from bulk_helpers import missing_ids
+
 # User Table
 class User(db.Model):
     __tablename__ = 'users'
@@ -25,11 +39,97 @@ class Role(db.Model):
 # UserRoles Table (many-to-many relationship)
 class UserRole(db.Model):
     __tablename__ = 'user_roles'
+    # The primary key covers "roles of a user"; this covers "users with a role"
+    __table_args__ = (db.Index('ix_user_roles_role_id_user_id', 'role_id', 'user_id'),)
+
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
     role_id = db.Column(db.Integer, db.ForeignKey('roles.id'), primary_key=True)
     user = db.relationship(User, backref=db.backref('user_roles'))
     role = db.relationship(Role, backref=db.backref('user_roles'))
 
+
+# Totals are cached per filter signature, estimated or skipped (?count=)
+paginator = CountingPaginator(app, db)
+
+
+# Role name lookup
+# The roles table is tiny and rarely written, so the role filter is resolved
+# against an in-process list of (id, name) pairs and becomes user_roles.role_id IN (...)
+# instead of LIKE conditions across a three-way join. A commit that writes to
+# roles drops the map; the TTL covers writes made by other processes.
+ROLE_IDS_TTL = 60  # seconds
+
+_role_ids = None  # ([(id, name)], expires_at); names are not unique
+_role_ids_generation = 0
+_role_ids_lock = threading.Lock()
+
+
+def invalidate_role_ids():
+    global _role_ids, _role_ids_generation
+    with _role_ids_lock:
+        _role_ids = None
+        _role_ids_generation += 1
+
+
+@on_commit_writes
+def _invalidate_role_ids_on_commit(engine, tables):
+    # None stands for a write whose table could not be determined
+    if None in tables or Role.__tablename__ in tables:
+        invalidate_role_ids()
+
+
+def role_names():
+    global _role_ids
+    with _role_ids_lock:
+        cached, generation = _role_ids, _role_ids_generation
+    if cached and cached[1] > time.monotonic():
+        return cached[0]
+    roles = db.session.query(Role.id, Role.name).all()
+    with _role_ids_lock:
+        # Don't store a list read before a concurrent role write was committed
+        if generation == _role_ids_generation:
+            _role_ids = (roles, time.monotonic() + ROLE_IDS_TTL)
+    return roles
+
+
+def like_pattern(term):
+    # LIKE '%term%' as a regular expression: % matches any run of characters, _ any one
+    pattern = ''.join('.*' if char == '%' else '.' if char == '_' else re.escape(char) for char in term)
+    return re.compile(f'.*{pattern}.*', re.IGNORECASE | re.DOTALL)
+
+
+def matching_role_ids(role_filter):
+    # Same matches as the former Role.name LIKE '%term%' (case-insensitive, as on SQLite)
+    patterns = [like_pattern(term.strip()) for term in role_filter.split(',')]
+    return sorted(role_id for role_id, name in role_names()
+                  if any(pattern.fullmatch(name) for pattern in patterns))
+
+
+def users_query(search, role_filter, require_role):
+    """Users matching the filters, each user once.
+
+    Joining user_roles and roles returns a user once per matching role, which
+    repeats users on a page and inflates the totals. The role conditions are
+    subqueries instead, and the roles of the page are loaded afterwards with
+    one IN query (selectinload) rather than one query per user.
+    """
+    query = db.session.query(User).options(selectinload(User.roles))
+
+    if search:
+        query = query.filter(
+            (User.username.like(f'%{search}%')) |
+            (User.email.like(f'%{search}%'))
+        )
+
+    if role_filter:
+        users_with_roles = db.session.query(UserRole.user_id).filter(UserRole.role_id.in_(matching_role_ids(role_filter)))
+        query = query.filter(User.id.in_(users_with_roles))
+    elif require_role:
+        query = query.filter(User.roles.any())
+
+    return query
+
+
 # API endpoint to get users with pagination, filtering, searching, and sorting
 @app.route('/users', methods=['GET'])
 def get_users():
@@ -39,19 +139,13 @@ def get_users():
     sort_by = request.args.get('sort_by', 'id', type=str)
     sort_order = request.args.get('sort_order', 'asc', type=str)
     role_filter = request.args.get('role', '', type=str)
+    count_mode = request.args.get('count', 'exact', type=str)
 
-    query = db.session.query(User).join(UserRole, UserRole.user_id == User.id).join(Role, Role.id == UserRole.role_id)
-
-    if search:
-        query = query.filter(
-            (User.username.like(f'%{search}%')) |
-            (User.email.like(f'%{search}%'))
-        )
+    if count_mode not in COUNT_MODES:
+        return jsonify({'error': f"count must be one of {', '.join(COUNT_MODES)}"}), 400
 
-    if role_filter:
-        roles = role_filter.split(',')
-        role_filters = [Role.name.like(f'%{role.strip()}%') for role in roles]
-        query = query.filter(or_(*role_filters))
+    # Only users with at least one role, like the inner join this replaces
+    query = users_query(search, role_filter, require_role=True)
 
     if sort_by == 'username':
         sort_column = User.username
@@ -65,7 +159,10 @@ def get_users():
     else:
         query = query.order_by(sort_column.asc())
 
-    users = query.paginate(page, per_page, False)
+    roles_signature = tuple(sorted({role.strip() for role in role_filter.split(',')})) if role_filter else ()
+    # Never empty: users without a role are always filtered out here
+    signature = (search, roles_signature, 'with_role')
+    users = paginator.paginate(query, page, per_page, count_mode, signature, (User, UserRole, Role))
 
     result = {
         'total': users.total,
@@ -92,19 +189,8 @@ def get_users_lef_join():
     sort_order = request.args.get('sort_order', 'asc', type=str)
     role_filter = request.args.get('role', '', type=str)
 
-    # Using LEFT JOIN to include users without roles
-    query = db.session.query(User).join(UserRole, UserRole.user_id == User.id, isouter=True).join(Role, Role.id == UserRole.role_id, isouter=True)
-
-    if search:
-        query = query.filter(
-            (User.username.like(f'%{search}%')) |
-            (User.email.like(f'%{search}%'))
-        )
-
-    if role_filter:
-        roles = role_filter.split(',')
-        role_filters = [Role.name.like(f'%{role.strip()}%') for role in roles]
-        query = query.filter(or_(*role_filters))
+    # Includes users without roles, like a LEFT JOIN, unless roles are filtered
+    query = users_query(search, role_filter, require_role=False)
 
     if sort_by == 'username':
         sort_column = User.username
@@ -185,10 +271,54 @@ def assign_role_to_user(user_id):
 
     return jsonify({'message': 'Role assigned to user successfully'}), 200
 
+def is_id(value):
+    # bool is a subclass of int, but true is not user 1
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+# API endpoint to assign many roles to many users at once
+@app.route('/user_roles/bulk', methods=['POST'])
+def bulk_assign_roles():
+    data = request.get_json()
+
+    if not isinstance(data, list):
+        return jsonify({'error': 'Request body must be a list of {"user_id", "role_id"} pairs'}), 400
+
+    pairs = []
+    for pair in data:
+        if not isinstance(pair, dict) or not is_id(pair.get('user_id')) or not is_id(pair.get('role_id')):
+            return jsonify({'error': 'Each pair must have integer user_id and role_id fields'}), 400
+        pairs.append((pair['user_id'], pair['role_id']))
+    pairs = list(dict.fromkeys(pairs))
+
+    # Two set lookups instead of a get() per pair
+    missing_users = missing_ids(db.session, User, [user_id for user_id, _ in pairs])
+    if missing_users:
+        return jsonify({'error': 'User not found', 'missing_user_ids': missing_users}), 404
+    missing_roles = missing_ids(db.session, Role, [role_id for _, role_id in pairs])
+    if missing_roles:
+        return jsonify({'error': 'Role not found', 'missing_role_ids': missing_roles}), 404
+
+    # Pairs that are already assigned are skipped by the database, and no
+    # user.roles collection is loaded
+    assigned = insert_ignoring_duplicates(db, UserRole.__table__, [
+        {'user_id': user_id, 'role_id': role_id} for user_id, role_id in pairs
+    ])
+    db.session.commit()
+
+    return jsonify({
+        'message': 'Roles assigned to users successfully',
+        'assigned': assigned,
+        'already_assigned': len(pairs) - assigned
+    }), 200
+
 # Initialize the database
 @app.before_first_request
 def create_tables():
     db.create_all()
+    # create_all() skips existing tables, so add indexes introduced later
+    for index in UserRole.__table__.indexes:
+        index.create(db.engine, checkfirst=True)
 
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
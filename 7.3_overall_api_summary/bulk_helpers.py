@@ -0,0 +1,37 @@
+"""Chunking and existence checks for the bulk endpoints of the 7.3 apps.
+
+Bulk endpoints work on a few hundred rows per statement: large enough to keep
+round trips low, small enough to stay under the bound parameter limit of SQLite
+and the other databases.
+
+    for chunk in chunks(ids):
+        db.session.query(Book).filter(Book.id.in_(chunk)).delete(synchronize_session=False)
+    missing = missing_ids(db.session, Author, [row['author_id'] for row in rows])
+"""
+BULK_CHUNK_SIZE = 500
+
+
+def chunks(items, size=BULK_CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def as_id(value):
+    """The integer id equal to value, e.g. 5 for '5', or None if there is none."""
+    try:
+        row_id = int(value)
+    except (TypeError, ValueError):
+        return None
+    return row_id if isinstance(value, str) or row_id == value else None
+
+
+def missing_ids(session, model, ids):
+    """Return the ids without a row in model's table, in request order.
+
+    Ids are compared as integers, as the database compares them with the
+    integer id column, so '5' is found when row 5 exists.
+    """
+    found = set()
+    for chunk in chunks(list({as_id(row_id) for row_id in ids} - {None})):
+        found.update(row_id for (row_id,) in session.query(model.id).filter(model.id.in_(chunk)))
+    return [row_id for row_id in dict.fromkeys(ids) if as_id(row_id) not in found]
@@ -1,5 +1,9 @@
+import os
+import sys
+
 from flask import Flask, jsonify, request, abort
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import inspect, text
 
 # Initialize the Flask app and the SQLAlchemy object
 app = Flask(__name__)
@@ -7,49 +11,141 @@ app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///books_authors.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 db = SQLAlchemy(app)
 
+# Aggregate responses are cached until a table they read is written (see ../aggregate_cache.py)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from aggregate_cache import AggregateCache
+
+# Helpers shared with other chapters live in ../../common
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from common.streaming import select_fields, stream_rows
+
 
 # Define the Author and Book models
 class Author(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
+    # Maintained by the BOOK_COUNT_TRIGGERS below, never written by the app
+    book_count = db.Column(db.Integer, nullable=False, default=0, server_default='0', index=True)
     books = db.relationship('Book', backref='author', lazy=True)
 
 
 class Book(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
-    author_id = db.Column(db.Integer, db.ForeignKey('author.id'), nullable=False)
+    author_id = db.Column(db.Integer, db.ForeignKey('author.id'), nullable=False, index=True)
+
+
+# Book counters
+# The GROUP BY / HAVING endpoints read Author.book_count instead of joining and
+# counting book on every request. Triggers update it in the same transaction
+# as every insert, delete or change of author on book, whichever code path
+# makes the write (ORM, bulk Core inserts, the seeder). They only ever apply
+# relative updates (book_count = book_count + 1), so concurrent writers never
+# overwrite each other's changes and no version check or lock is needed.
+# `flask reconcile-book-counts` fixes any author whose count has drifted, e.g.
+# after loading data with the triggers missing, and is safe to run from cron.
+BOOK_COUNT_TRIGGERS = {
+    'sqlite': [
+        """CREATE TRIGGER IF NOT EXISTS book_count_ai AFTER INSERT ON book BEGIN
+            UPDATE author SET book_count = book_count + 1 WHERE id = new.author_id;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS book_count_ad AFTER DELETE ON book BEGIN
+            UPDATE author SET book_count = book_count - 1 WHERE id = old.author_id;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS book_count_au AFTER UPDATE OF author_id ON book
+            WHEN old.author_id IS NOT new.author_id BEGIN
+            UPDATE author SET book_count = book_count - 1 WHERE id = old.author_id;
+            UPDATE author SET book_count = book_count + 1 WHERE id = new.author_id;
+        END""",
+    ],
+    'postgresql': [
+        """CREATE OR REPLACE FUNCTION author_book_count_sync() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'UPDATE' AND OLD.author_id IS NOT DISTINCT FROM NEW.author_id THEN
+                RETURN NULL;
+            END IF;
+            IF TG_OP IN ('DELETE', 'UPDATE') THEN
+                UPDATE author SET book_count = book_count - 1 WHERE id = OLD.author_id;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                UPDATE author SET book_count = book_count + 1 WHERE id = NEW.author_id;
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql""",
+        "DROP TRIGGER IF EXISTS book_count ON book",
+        """CREATE TRIGGER book_count AFTER INSERT OR DELETE OR UPDATE OF author_id ON book
+            FOR EACH ROW EXECUTE FUNCTION author_book_count_sync()""",
+    ],
+    'mysql': [
+        """CREATE TRIGGER IF NOT EXISTS book_count_ai AFTER INSERT ON book FOR EACH ROW
+            UPDATE author SET book_count = book_count + 1 WHERE id = NEW.author_id""",
+        """CREATE TRIGGER IF NOT EXISTS book_count_ad AFTER DELETE ON book FOR EACH ROW
+            UPDATE author SET book_count = book_count - 1 WHERE id = OLD.author_id""",
+        """CREATE TRIGGER IF NOT EXISTS book_count_au AFTER UPDATE ON book FOR EACH ROW
+        BEGIN
+            IF NOT (OLD.author_id <=> NEW.author_id) THEN
+                UPDATE author SET book_count = book_count - 1 WHERE id = OLD.author_id;
+                UPDATE author SET book_count = book_count + 1 WHERE id = NEW.author_id;
+            END IF;
+        END""",
+    ],
+}
+
+
+def reconcile_book_counts():
+    """Recount the books of every author whose book_count is wrong; returns how many were fixed."""
+    actual = db.select(db.func.count(Book.id)).where(Book.author_id == Author.id).scalar_subquery()
+    result = db.session.execute(
+        db.update(Author).where(Author.book_count != actual).values(book_count=actual),
+        execution_options={'synchronize_session': False}
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+@app.cli.command('reconcile-book-counts')
+def reconcile_book_counts_command():
+    """Fix Author.book_count wherever it differs from the books in the table."""
+    print(f"{reconcile_book_counts()} author book counts corrected")
 
 
 # Initialize the database (you only need to run this once)
 with app.app_context():
     db.create_all()
+    # create_all() skips existing tables, so add the columns and indexes introduced later
+    counts_exist = 'book_count' in {column['name'] for column in inspect(db.engine).get_columns('author')}
+    with db.engine.begin() as conn:
+        if not counts_exist:
+            conn.execute(text("ALTER TABLE author ADD COLUMN book_count INTEGER NOT NULL DEFAULT 0"))
+        for statement in BOOK_COUNT_TRIGGERS.get(db.engine.dialect.name, []):
+            conn.execute(text(statement))
+    for index in [*Author.__table__.indexes, *Book.__table__.indexes]:
+        index.create(db.engine, checkfirst=True)
+    if not counts_exist:
+        # Existing books were added before the column and its triggers
+        reconcile_book_counts()
+
+aggregate_cache = AggregateCache(app, db)
+
+
+# Columns of the /authors_with_books export; book_author_id shows the column used in the JOIN
+AUTHOR_BOOK_FIELDS = {
+    'author_id': Author.id,
+    'author_name': Author.name,
+    'book_id': Book.id,
+    'book_title': Book.title,
+    'book_author_id': Book.author_id,
+}
 
 
 # API endpoint to demonstrate JOIN
+# ?fields=author_name,book_title selects columns, ?format=ndjson writes one object per line
 @app.route('/authors_with_books', methods=['GET'])
 def get_authors_with_books():
-    # Perform a SQL JOIN using SQLAlchemy ORM relationship
-    authors_with_books = db.session.query(
-        Author.id.label('author_id'),
-        Author.name.label('author_name'),
-        Book.id.label('book_id'),
-        Book.title.label('book_title'),
-        Book.author_id.label('book_author_id')  # This is the join column
-    ).join(Book, Author.id == Book.author_id).all()  # Explicitly specifying join condition
-
-    # Format the result as JSON including join columns (author and book details)
-    result = []
-    for row in authors_with_books:
-        result.append({
-            'author_id': row.author_id,
-            'author_name': row.author_name,
-            'book_id': row.book_id,
-            'book_title': row.book_title,
-            'book_author_id': row.book_author_id  # This shows the column used in JOIN
-        })
-
-    return jsonify(result)
+    # Perform a SQL JOIN, explicitly specifying the join condition
+    statement = db.select(*select_fields(AUTHOR_BOOK_FIELDS)).select_from(Author).join(Book, Author.id == Book.author_id)
+    return stream_rows(db.session, statement)
 
 
 # Create a new author
@@ -138,13 +234,15 @@ def delete_book(id):
 
 # API endpoint for GROUP BY to count books per author
 @app.route('/authors_books_count', methods=['GET'])
+@aggregate_cache.cached('author', 'book')
 def authors_books_count():
-    # Perform a GROUP BY query to count books per author
+    # The per-author counts are kept in Author.book_count, so no join or GROUP BY
+    # is needed; authors without books are left out as the join used to do
     result = db.session.query(
         Author.id.label('author_id'),
         Author.name.label('author_name'),
-        db.func.count(Book.id).label('book_count')
-    ).join(Book, Author.id == Book.author_id).group_by(Author.id).all()
+        Author.book_count
+    ).filter(Author.book_count > 0).order_by(Author.id).all()
 
     # Format the result as JSON
     authors_books = []
@@ -1,5 +1,9 @@
+import os
+import sys
+
 from flask import Flask, jsonify, request, abort
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import inspect, text
 
 # Initialize the Flask app and the SQLAlchemy object
 app = Flask(__name__)
@@ -7,10 +11,22 @@ app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///students_courses.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 db = SQLAlchemy(app)
 
+# Aggregate responses are cached until a table they read is written (see ../aggregate_cache.py)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from aggregate_cache import AggregateCache
+
+# Helpers shared with other chapters live in ../../common
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from common.bulk_insert import INSERT_CHUNK_SIZE, insert_ignoring_duplicates
+from common.course_rosters import course_rosters
+from common.streaming import select_fields, stream_rows
+
 # Define the Association Table for Many-to-Many Relationship between Students and Courses
 student_course = db.Table('student_course',
                           db.Column('student_id', db.Integer, db.ForeignKey('student.id'), primary_key=True),
-                          db.Column('course_id', db.Integer, db.ForeignKey('course.id'), primary_key=True)
+                          db.Column('course_id', db.Integer, db.ForeignKey('course.id'), primary_key=True),
+                          # The primary key finds a student's courses, this index a course's students
+                          db.Index('ix_student_course_course_id_student_id', 'course_id', 'student_id')
                           )
 
 
@@ -26,32 +42,128 @@ class Course(db.Model):
     name = db.Column(db.String(100), nullable=False)
 
 
+# Enrollment counters
+# The GROUP BY / HAVING endpoints read the number of students per course from
+# course_student_count instead of counting student_course on every request.
+# Triggers update it in the same transaction as every write to course and
+# student_course, whichever code path makes the write (ORM, bulk inserts, the
+# seeder). `flask rebuild-course-counts` recounts everything if it ever drifts,
+# e.g. after loading data with the triggers missing.
+course_student_count = db.Table('course_student_count',
+                                db.Column('course_id', db.Integer, primary_key=True),
+                                db.Column('student_count', db.Integer, nullable=False, default=0),
+                                db.Index('ix_course_student_count_student_count', 'student_count')
+                                )
+
+COUNTER_TRIGGERS = {
+    'sqlite': [
+        """CREATE TRIGGER IF NOT EXISTS course_count_ai AFTER INSERT ON course BEGIN
+            INSERT INTO course_student_count (course_id, student_count) VALUES (new.id, 0);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS course_count_ad AFTER DELETE ON course BEGIN
+            DELETE FROM course_student_count WHERE course_id = old.id;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS student_course_count_ai AFTER INSERT ON student_course BEGIN
+            UPDATE course_student_count SET student_count = student_count + 1 WHERE course_id = new.course_id;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS student_course_count_ad AFTER DELETE ON student_course BEGIN
+            UPDATE course_student_count SET student_count = student_count - 1 WHERE course_id = old.course_id;
+        END""",
+    ],
+    'postgresql': [
+        """CREATE OR REPLACE FUNCTION course_student_count_sync() RETURNS trigger AS $$
+        BEGIN
+            IF TG_TABLE_NAME = 'course' AND TG_OP = 'INSERT' THEN
+                INSERT INTO course_student_count (course_id, student_count) VALUES (NEW.id, 0);
+            ELSIF TG_TABLE_NAME = 'course' THEN
+                DELETE FROM course_student_count WHERE course_id = OLD.id;
+            ELSIF TG_OP = 'INSERT' THEN
+                UPDATE course_student_count SET student_count = student_count + 1 WHERE course_id = NEW.course_id;
+            ELSE
+                UPDATE course_student_count SET student_count = student_count - 1 WHERE course_id = OLD.course_id;
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql""",
+        "DROP TRIGGER IF EXISTS course_count ON course",
+        """CREATE TRIGGER course_count AFTER INSERT OR DELETE ON course
+            FOR EACH ROW EXECUTE FUNCTION course_student_count_sync()""",
+        "DROP TRIGGER IF EXISTS student_course_count ON student_course",
+        """CREATE TRIGGER student_course_count AFTER INSERT OR DELETE ON student_course
+            FOR EACH ROW EXECUTE FUNCTION course_student_count_sync()""",
+    ],
+    'mysql': [
+        """CREATE TRIGGER IF NOT EXISTS course_count_ai AFTER INSERT ON course FOR EACH ROW
+            INSERT INTO course_student_count (course_id, student_count) VALUES (NEW.id, 0)""",
+        """CREATE TRIGGER IF NOT EXISTS course_count_ad AFTER DELETE ON course FOR EACH ROW
+            DELETE FROM course_student_count WHERE course_id = OLD.id""",
+        """CREATE TRIGGER IF NOT EXISTS student_course_count_ai AFTER INSERT ON student_course FOR EACH ROW
+            UPDATE course_student_count SET student_count = student_count + 1 WHERE course_id = NEW.course_id""",
+        """CREATE TRIGGER IF NOT EXISTS student_course_count_ad AFTER DELETE ON student_course FOR EACH ROW
+            UPDATE course_student_count SET student_count = student_count - 1 WHERE course_id = OLD.course_id""",
+    ],
+}
+
+
+def rebuild_course_counts():
+    """Recount the students of every course from student_course."""
+    counts = db.select(Course.id, db.func.count(student_course.c.student_id)) \
+        .outerjoin(student_course, Course.id == student_course.c.course_id) \
+        .group_by(Course.id)
+    db.session.execute(course_student_count.delete())
+    db.session.execute(course_student_count.insert().from_select(['course_id', 'student_count'], counts))
+    db.session.commit()
+
+
+@app.cli.command('rebuild-course-counts')
+def rebuild_course_counts_command():
+    """Recount course_student_count from student_course."""
+    rebuild_course_counts()
+    print('Course student counts rebuilt')
+
+
 # Initialize the database (you only need to run this once)
 with app.app_context():
+    counters_exist = inspect(db.engine).has_table('course_student_count')
     db.create_all()
+    # create_all() skips existing tables, so add indexes introduced later
+    for index in student_course.indexes:
+        index.create(db.engine, checkfirst=True)
+    with db.engine.begin() as conn:
+        for statement in COUNTER_TRIGGERS.get(db.engine.dialect.name, []):
+            conn.execute(text(statement))
+    if not counters_exist:
+        # Existing enrollments were made before the triggers
+        rebuild_course_counts()
+
+aggregate_cache = AggregateCache(app, db)
+
+
+# Enrollments are written straight to the association table. Going through
+# student.courses loads the student's whole course list to check membership
+# and to append or remove one course.
+def insert_enrollments(rows):
+    """Insert student_course rows, skipping pairs that already exist; returns how many were inserted."""
+    return insert_ignoring_duplicates(db, student_course, rows)
+
+
+# Columns of the /students_with_courses export
+STUDENT_COURSE_FIELDS = {
+    'student_id': Student.id,
+    'student_name': Student.name,
+    'course_id': Course.id,
+    'course_name': Course.name,
+}
 
 
 # API endpoint to demonstrate Many-to-Many JOIN (Get all students with their courses)
+# ?fields=student_name,course_name selects columns, ?format=ndjson writes one object per line
 @app.route('/students_with_courses', methods=['GET'])
 def get_students_with_courses():
-    students_with_courses = db.session.query(
-        Student.id.label('student_id'),
-        Student.name.label('student_name'),
-        Course.id.label('course_id'),
-        Course.name.label('course_name')
-    ).join(student_course, Student.id == student_course.c.student_id).join(Course,
-                                                                           Course.id == student_course.c.course_id).all()
-
-    result = []
-    for row in students_with_courses:
-        result.append({
-            'student_id': row.student_id,
-            'student_name': row.student_name,
-            'course_id': row.course_id,
-            'course_name': row.course_name
-        })
-
-    return jsonify(result)
+    statement = db.select(*select_fields(STUDENT_COURSE_FIELDS)).select_from(Student) \
+        .join(student_course, Student.id == student_course.c.student_id) \
+        .join(Course, Course.id == student_course.c.course_id)
+    return stream_rows(db.session, statement)
 
 
 # Create a new student
@@ -142,10 +254,10 @@ def enroll_student_in_course(student_id, course_id):
     if not student or not course:
         abort(404, 'Student or Course not found')
 
-    # Enroll student in the course (many-to-many relationship)
-    if course not in student.courses:
-        student.courses.append(course)
-        db.session.commit()
+    # Enroll student in the course (many-to-many relationship); the primary key
+    # makes an existing enrollment a no-op
+    insert_enrollments([{'student_id': student.id, 'course_id': course.id}])
+    db.session.commit()
 
     return jsonify({'student_id': student.id, 'student_name': student.name, 'course_id': course.id,
                     'course_name': course.name}), 200
@@ -160,21 +272,55 @@ def disenroll_student_from_course(student_id, course_id):
         abort(404, 'Student or Course not found')
 
     # Disenroll student from the course
-    if course in student.courses:
-        student.courses.remove(course)
-        db.session.commit()
+    db.session.execute(student_course.delete().where(student_course.c.student_id == student.id,
+                                                     student_course.c.course_id == course.id))
+    db.session.commit()
 
     return jsonify({'message': 'Student disenrolled from course successfully'}), 200
 
 
+# API endpoint to enroll a list of students in a course at once (course roster)
+@app.route('/courses/<int:course_id>/students', methods=['POST'])
+def enroll_students_in_course(course_id):
+    course = Course.query.get(course_id)
+    if not course:
+        abort(404, 'Course not found')
+
+    data = request.get_json()
+    student_ids = data.get('student_ids') if isinstance(data, dict) else None
+    if not isinstance(student_ids, list) or not all(type(student_id) is int for student_id in student_ids):
+        abort(400, 'student_ids must be a list of student IDs')
+    student_ids = list(dict.fromkeys(student_ids))
+
+    # Check that all students exist with one IN query per chunk
+    found = set()
+    for start in range(0, len(student_ids), INSERT_CHUNK_SIZE):
+        chunk = student_ids[start:start + INSERT_CHUNK_SIZE]
+        found.update(student_id for (student_id,) in db.session.query(Student.id).filter(Student.id.in_(chunk)))
+    missing = [student_id for student_id in student_ids if student_id not in found]
+    if missing:
+        abort(404, f"Students not found: {', '.join(map(str, missing))}")
+
+    enrolled = insert_enrollments([{'student_id': student_id, 'course_id': course.id} for student_id in student_ids])
+    db.session.commit()
+
+    return jsonify({'course_id': course.id, 'course_name': course.name, 'enrolled': enrolled,
+                    'already_enrolled': len(student_ids) - enrolled}), 200
+
+
 # API endpoint to demonstrate GROUP BY (many-to-many)
 @app.route('/courses_student_count', methods=['GET'])
+@aggregate_cache.cached('course', 'student_course', 'course_student_count')
 def courses_student_count():
+    # Same rows as COUNT(*) ... GROUP BY over student_course (courses with students)
     result = db.session.query(
         Course.id.label('course_id'),
         Course.name.label('course_name'),
-        db.func.count(student_course.c.student_id).label('student_count')
-    ).join(student_course, Course.id == student_course.c.course_id).group_by(Course.id).all()
+        course_student_count.c.student_count
+    ).join(course_student_count, Course.id == course_student_count.c.course_id) \
+     .filter(course_student_count.c.student_count > 0) \
+     .order_by(Course.id) \
+     .all()
 
     courses_with_student_count = []
     for row in result:
@@ -189,15 +335,20 @@ def courses_student_count():
 
 # API endpoint to demonstrate HAVING clause (many-to-many)
 @app.route('/courses_student_count_having', methods=['GET'])
+@aggregate_cache.cached('course', 'student_course', 'course_student_count')
 def courses_student_count_having():
     min_students = request.args.get('min_students', 1, type=int)
 
+    # HAVING COUNT(...) >= min_students becomes a range scan on the student_count
+    # index, which also returns the biggest courses first
     result = db.session.query(
         Course.id.label('course_id'),
         Course.name.label('course_name'),
-        db.func.count(student_course.c.student_id).label('student_count')
-    ).join(student_course, Course.id == student_course.c.course_id).group_by(Course.id).having(
-        db.func.count(student_course.c.student_id) >= min_students).all()
+        course_student_count.c.student_count
+    ).join(course_student_count, Course.id == course_student_count.c.course_id) \
+     .filter(course_student_count.c.student_count >= max(min_students, 1)) \
+     .order_by(course_student_count.c.student_count.desc(), Course.id) \
+     .all()
 
     courses_with_student_count = []
     for row in result:
@@ -211,31 +362,18 @@ def courses_student_count_having():
 
 
 # API endpoint to demonstrate HAVING clause and list all students enrolled in a course (many-to-many)
+# ?students_limit=N&students_offset=M returns one page of each course's students (ordered by name)
 @app.route('/courses_student_count_having_with_students', methods=['GET'])
+@aggregate_cache.cached('course', 'student', 'student_course', 'course_student_count')
 def courses_student_count_having_with_students():
     min_students = request.args.get('min_students', 1, type=int)
+    students_limit = request.args.get('students_limit', type=int)
+    students_offset = max(request.args.get('students_offset', 0, type=int), 0)
 
-    result = db.session.query(
-        Course.id.label('course_id'),
-        Course.name.label('course_name'),
-        db.func.count(student_course.c.student_id).label('student_count'),
-        db.func.group_concat(Student.name).label('student_names')  # Aggregate student names
-    ).join(student_course, Course.id == student_course.c.course_id) \
-     .join(Student, Student.id == student_course.c.student_id) \
-     .group_by(Course.id) \
-     .having(db.func.count(student_course.c.student_id) >= min_students) \
-     .all()
-
-    courses_with_students = []
-    for row in result:
-        courses_with_students.append({
-            'course_id': row.course_id,
-            'course_name': row.course_name,
-            'student_count': row.student_count,
-            'students': row.student_names.split(',')  # Convert comma-separated names into a list
-        })
+    # Courses with enough students, from the maintained counters
+    counts = db.select(course_student_count).where(course_student_count.c.student_count >= max(min_students, 1)).subquery()
 
-    return jsonify(courses_with_students)
+    return course_rosters(db, Course, Student, student_course, counts, students_limit, students_offset)
 
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,73 @@
+"""Response cache for the read-mostly aggregate endpoints of the 7.4 examples.
+
+    aggregate_cache = AggregateCache(app, db)
+
+    @app.route('/authors_books_count', methods=['GET'])
+    @aggregate_cache.cached('author', 'book')
+    def authors_books_count():
+        ...
+
+Each decorated endpoint declares the tables it reads. The response body is
+cached under the endpoint, its query string and the versions of those tables in
+a common.response_cache.ResponseCache, so a commit that writes to one of them,
+through the ORM, Core statements or raw text() SQL, is visible on the next
+request.
+
+Bodies are kept in a local LRU (AGGREGATE_CACHE_SIZE entries). With
+AGGREGATE_CACHE_REDIS_URL set, the versions and bodies are shared through Redis
+as well, so a write handled by one worker invalidates the entries of all of them.
+Writes this process cannot see, such as those of other workers without Redis,
+of the 7.6 seeder or of a database console, show up once the entry expires after
+AGGREGATE_CACHE_TTL seconds.
+"""
+import os
+import sys
+from functools import wraps
+
+from flask import make_response, request
+
+# Helpers shared with other chapters live in ../common
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.response_cache import ResponseCache
+
+DEFAULTS = {
+    'AGGREGATE_CACHE_SIZE': 256,
+    'AGGREGATE_CACHE_REDIS_URL': None,
+    'AGGREGATE_CACHE_TTL': 60,  # seconds; bounds staleness after writes this process does not see
+}
+
+
+class AggregateCache:
+    def __init__(self, app, db):
+        config = {key: app.config.get(key, default) for key, default in DEFAULTS.items()}
+        self.cache = ResponseCache(config['AGGREGATE_CACHE_TTL'], config['AGGREGATE_CACHE_SIZE'],
+                                   config['AGGREGATE_CACHE_REDIS_URL'])
+        with app.app_context():
+            self.cache.track_writes(db.engine)
+
+    def invalidate(self, tables):
+        self.cache.invalidate(tables)
+
+    def cached(self, *tables):
+        """Cache the JSON body of a GET endpoint until one of `tables` is written."""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                query = sorted(request.args.items(multi=True))
+                key = self.cache.key(tables, [request.endpoint, repr(kwargs), query])
+                computed = {}
+
+                def compute():
+                    response = computed['response'] = make_response(view(*args, **kwargs))
+                    # Errors are passed through, not cached
+                    return response.get_data(as_text=True) if response.status_code == 200 else None
+
+                body = self.cache.get_or_compute(key, compute)
+                if body is None:
+                    return computed['response']
+                response = make_response(body)
+                response.mimetype = 'application/json'
+                response.headers['X-Cache'] = 'MISS' if computed else 'HIT'
+                return response
+            return wrapper
+        return decorator
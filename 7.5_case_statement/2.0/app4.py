@@ -1,3 +1,5 @@
+import os
+import sys
 from flask import Flask, request, jsonify
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy import func, case
@@ -12,6 +14,10 @@ app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 # Initialize the SQLAlchemy object
 db = SQLAlchemy(app)
 
+# "This month" is a half-open created_on range (see ../time_windows.py)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from time_windows import in_window
+
 
 # Define the User model
 class User(db.Model):
@@ -19,7 +25,7 @@ class User(db.Model):
     name = db.Column(db.String(100), nullable=False)
     age = db.Column(db.Integer, nullable=False)
     gender = db.Column(db.String(10), nullable=False)
-    created_on = db.Column(db.DateTime, default=datetime.utcnow)
+    created_on = db.Column(db.DateTime, default=datetime.utcnow, index=True)
 
     def __repr__(self):
         return f"<User(id={self.id}, name={self.name}, age={self.age}, gender={self.gender}, created_on={self.created_on})>"
@@ -29,6 +35,9 @@ class User(db.Model):
 @app.before_first_request
 def create_tables():
     db.create_all()
+    # create_all() skips existing tables, so add indexes introduced later
+    for index in User.__table__.indexes:
+        index.create(db.engine, checkfirst=True)
 
 
 # Route to insert a new user
@@ -55,10 +64,8 @@ def insert_user():
 # Route to get count of users by gender and count of users by gender created in this month
 @app.route('/user_count_by_gender', methods=['GET'])
 def user_count_by_gender():
-    # Get the current date and month
-    current_date = datetime.utcnow()
-    current_month = current_date.month
-    current_year = current_date.year
+    # Users created this month, as a created_on range that can use its index
+    this_month = in_window(User.created_on, 'this_month')
 
     # Corrected query with case() statement fixed
     query = db.session.query(
@@ -68,8 +75,7 @@ def user_count_by_gender():
             case(
                 [
                     (
-                        (func.extract('month', User.created_on) == current_month) &
-                        (func.extract('year', User.created_on) == current_year), 1
+                        this_month, 1
                     )
                 ],
                 else_=0
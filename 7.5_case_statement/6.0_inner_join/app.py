@@ -1,3 +1,5 @@
+import os
+import sys
 from flask import Flask, request, jsonify
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy import func, case, and_, or_
@@ -10,6 +12,10 @@ app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///your_database.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 db = SQLAlchemy(app)
 
+# "This month" is a half-open created_on range (see ../time_windows.py)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from time_windows import in_window
+
 
 # Define User and Company models
 
@@ -19,23 +25,21 @@ class User(db.Model):
     email = db.Column(db.String(100), unique=True)
     age = db.Column(db.Integer)
     gender = db.Column(db.String(10))
-    created_on = db.Column(db.DateTime, default=datetime.utcnow)
+    created_on = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     companies = db.relationship('Company', backref='user', lazy=True)
 
 
 class Company(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100))
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
 
 
 # Endpoint to count users by gender
 @app.route('/user_count_by_gender', methods=['GET'])
 def user_count_by_gender():
-    # Get the current date and month
-    current_date = datetime.utcnow()
-    current_month = current_date.month
-    current_year = current_date.year
+    # Users created this month, as a created_on range that can use its index
+    this_month = in_window(User.created_on, 'this_month')
 
     # Get query parameters for filtering
     email = request.args.get('email')  # optional filter by email
@@ -56,8 +60,7 @@ def user_count_by_gender():
             case(
                 [
                     (
-                        (func.extract('month', User.created_on) == current_month) &
-                        (func.extract('year', User.created_on) == current_year), 1
+                        this_month, 1
                     )
                 ],
                 else_=0
@@ -178,6 +181,9 @@ def insert_company():
 @app.before_first_request
 def create_tables():
     db.create_all()
+    # create_all() skips existing tables, so add indexes introduced later
+    for index in [*User.__table__.indexes, *Company.__table__.indexes]:
+        index.create(db.engine, checkfirst=True)
 
 
 if __name__ == '__main__':
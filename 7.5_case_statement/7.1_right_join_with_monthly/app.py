@@ -1,3 +1,5 @@
+import os
+import sys
 from flask import Flask, request, jsonify
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy import func, case, and_
@@ -10,6 +12,10 @@ app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///your_database.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 db = SQLAlchemy(app)
 
+# "This month" is a half-open created_on range (see ../time_windows.py)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from time_windows import in_window
+
 
 # Define User and Company models
 class User(db.Model):
@@ -18,22 +24,21 @@ class User(db.Model):
     email = db.Column(db.String(100), unique=True)
     age = db.Column(db.Integer)
     gender = db.Column(db.String(10))
-    created_on = db.Column(db.DateTime, default=datetime.utcnow)
+    created_on = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     companies = db.relationship('Company', backref='user', lazy=True)
 
 
 class Company(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100))
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True, index=True)
 
 
 # New Endpoint: Right Join and Group by Company with Overall and This Month's Male/Female Count
 @app.route('/company_user_right_join_with_counts', methods=['GET'])
 def company_user_right_join_with_counts():
-    # Get the current month and year
-    current_month = datetime.now().month
-    current_year = datetime.now().year
+    # Users created this month, as a created_on range that can use its index
+    this_month = in_window(User.created_on, 'this_month')
 
     # Query to get the overall and this month's count of users for each company, with male/female breakdown
     query = db.session.query(
@@ -48,10 +53,7 @@ def company_user_right_join_with_counts():
             case(
                 [
                     (
-                        and_(
-                            func.extract('month', User.created_on) == current_month,
-                            func.extract('year', User.created_on) == current_year
-                        ), 1)  # Sum 1 if condition matches
+                        this_month, 1)  # Sum 1 if condition matches
                 ],
                 else_=0  # Sum 0 if condition does not match
             )
@@ -80,8 +82,7 @@ def company_user_right_join_with_counts():
                     (
                         and_(
                             User.gender == 'Male',
-                            func.extract('month', User.created_on) == current_month,
-                            func.extract('year', User.created_on) == current_year
+                            this_month
                         ),
                         1  # If all conditions match, return 1
                     )
@@ -96,8 +97,7 @@ def company_user_right_join_with_counts():
                     (
                         and_(
                             User.gender == 'Female',
-                            func.extract('month', User.created_on) == current_month,
-                            func.extract('year', User.created_on) == current_year
+                            this_month
                         ),
                         1  # If all conditions match, return 1
                     )
@@ -195,6 +195,9 @@ def insert_company():
 @app.before_first_request
 def create_tables():
     db.create_all()
+    # create_all() skips existing tables, so add indexes introduced later
+    for index in [*User.__table__.indexes, *Company.__table__.indexes]:
+        index.create(db.engine, checkfirst=True)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,65 @@
+"""Half-open created_on ranges for the "this month" reports of the 7.5 examples.
+
+Comparing func.extract('month', User.created_on) and func.extract('year', ...)
+with the current month wraps the column in a function: the database has to
+evaluate it for every row and cannot use an index on created_on. in_window()
+compares the bare column with the bounds of a named window instead,
+
+    created_on >= '2026-10-01 00:00:00' AND created_on < '2026-11-01 00:00:00'
+
+which an index on created_on answers with a range scan. The end is exclusive,
+so consecutive windows never count a row twice. Bounds are naive UTC, like the
+datetime.utcnow default of created_on.
+
+    query.filter(in_window(User.created_on, 'this_month'))
+    case([(in_window(User.created_on, 'last_7_days'), 1)], else_=0)
+"""
+import re
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_
+
+LAST_N_DAYS = re.compile(r'last_(\d+)_days$')
+
+
+def month_start(moment, months=0):
+    """Midnight on the first day of the month `months` after the one containing `moment`."""
+    month = moment.year * 12 + moment.month - 1 + months
+    return datetime(month // 12, month % 12 + 1, 1)
+
+
+def time_window(name, now=None):
+    """Return the (start, end) bounds of a named window; start is included, end is not.
+
+    Windows: today, yesterday, this_week (from Monday), this_month, last_month,
+    this_year, last_year and last_<n>_days (the n * 24 hours up to now).
+    """
+    now = now or datetime.utcnow()
+    today = datetime(now.year, now.month, now.day)
+
+    if name == 'today':
+        return today, today + timedelta(days=1)
+    if name == 'yesterday':
+        return today - timedelta(days=1), today
+    if name == 'this_week':
+        monday = today - timedelta(days=today.weekday())
+        return monday, monday + timedelta(weeks=1)
+    if name == 'this_month':
+        return month_start(now), month_start(now, 1)
+    if name == 'last_month':
+        return month_start(now, -1), month_start(now)
+    if name == 'this_year':
+        return datetime(now.year, 1, 1), datetime(now.year + 1, 1, 1)
+    if name == 'last_year':
+        return datetime(now.year - 1, 1, 1), datetime(now.year, 1, 1)
+
+    match = LAST_N_DAYS.match(name)
+    if match:
+        return now - timedelta(days=int(match.group(1))), now
+    raise ValueError(f"Unknown time window: {name}")
+
+
+def in_window(column, name, now=None):
+    """`column >= start AND column < end` for the named window."""
+    start, end = time_window(name, now)
+    return and_(column >= start, column < end)
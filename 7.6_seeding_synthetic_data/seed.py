@@ -0,0 +1,175 @@
+"""Fill any of the 7.x example databases with large synthetic datasets.
+
+The schema is reflected from the database, so the tables must already exist
+(start the example app once). Re-running is safe: rows are generated
+deterministically and rows whose natural key (email, username, name, title or
+the pair of an association table) is already present are skipped, so
+increasing a count only adds the missing rows.
+
+    python seed.py sqlite:///../7.3_overall_api_summary/1.one_to_many/example.db author=10000 book=1000000
+    python seed.py sqlite:///users.db user=500000 company=200000 --skew 2 --months 24
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, event, select, MetaData
+from sqlalchemy import Boolean, Date, DateTime, Float, Integer, Numeric
+
+FIRST_NAMES = ['Ava', 'Liam', 'Maya', 'Noah', 'Zara', 'Ethan', 'Isha', 'Omar', 'Lena', 'Ravi',
+               'Chloe', 'Mateo', 'Aiko', 'Jonas', 'Priya', 'Lucas', 'Sofia', 'Arjun', 'Nora', 'Felix']
+LAST_NAMES = ['Smith', 'Kumar', 'Garcia', 'Chen', 'Müller', 'Rossi', 'Okafor', 'Tanaka', 'Silva', 'Novak',
+              'Shah', 'Brown', 'Kowalski', 'Dubois', 'Haddad', 'Jensen', 'Ivanova', 'Reddy', 'Moreau', 'Park']
+TITLE_WORDS = ['Silent', 'River', 'Empire', 'Glass', 'Winter', 'Garden', 'Shadow', 'Atlas', 'Ember', 'Harbor',
+               'Midnight', 'Orchard', 'Signal', 'Paper', 'Crown', 'Echo', 'Lantern', 'Tide', 'Cipher', 'Meadow']
+GENRES = ['Fiction', 'Non-Fiction', 'Fantasy', 'Science Fiction', 'Mystery', 'Biography', 'History', 'Poetry']
+GENRE_WEIGHTS = [30, 20, 12, 10, 12, 6, 6, 4]
+ROLES = ['Admin', 'Manager', 'Developer', 'Analyst', 'Support', 'Viewer']
+COURSES = ['Mathematics', 'Physics', 'Chemistry', 'Biology', 'History', 'Literature', 'Economics', 'Art']
+
+NATURAL_KEY_COLUMNS = ('email', 'username', 'name', 'title')
+
+
+def person_name(i):
+    return f"{FIRST_NAMES[i % 20]} {LAST_NAMES[i // 20 % 20]} {i}"
+
+
+def column_value(table, column, i, rng, options):
+    """Realistic value for row `i` of `table`, chosen by column name, then type."""
+    name = column.name
+    if name == 'email':
+        return f"user{i}@example.com"
+    if name == 'username':
+        return f"user{i}"
+    if name == 'name':
+        if table.name in ('roles', 'role'):
+            return ROLES[i] if i < len(ROLES) else f"Role {i}"
+        if table.name == 'course':
+            return f"{COURSES[i % len(COURSES)]} {i // len(COURSES) + 101}"
+        if table.name == 'company':
+            return f"{LAST_NAMES[i % 20]} {TITLE_WORDS[i // 20 % 20]} {i}"
+        return person_name(i)
+    if name == 'title':
+        return f"The {TITLE_WORDS[i % 20]} {TITLE_WORDS[i // 20 % 20]} {i}"
+    if name == 'author':
+        return person_name(int(options.authors * rng.random() ** options.skew))
+    if name == 'genre':
+        return rng.choices(GENRES, GENRE_WEIGHTS)[0]
+    if name == 'gender':
+        return 'Male' if rng.random() < 0.5 else 'Female'
+    if name == 'age':
+        return rng.randint(18, 70)
+    if name == 'year':
+        return rng.randint(1950, 2024)
+    if name == 'rating':
+        return round(rng.uniform(1, 10), 1)
+    if name.endswith('amount'):
+        return round(rng.lognormvariate(5, 1), 2)
+    if isinstance(column.type, DateTime):
+        return options.now - timedelta(seconds=rng.random() * options.months * 30 * 86400)
+    if isinstance(column.type, Date):
+        return (options.now - timedelta(days=rng.random() * options.months * 30)).date()
+    if isinstance(column.type, Boolean):
+        return rng.random() < 0.5
+    if isinstance(column.type, Integer):
+        return rng.randint(0, 1000)
+    if isinstance(column.type, (Float, Numeric)):
+        return round(rng.uniform(0, 1000), 2)
+    return f"{name} {i}"
+
+
+def pick(ids, rng, skew):
+    # skew 1 is uniform; larger values concentrate rows on the lowest ids
+    return ids[int(len(ids) * rng.random() ** skew)]
+
+
+def parent_ids(conn, column):
+    foreign_key = next(iter(column.foreign_keys))
+    ids = conn.execute(select(foreign_key.column)).scalars().all()
+    if not ids:
+        raise SystemExit(f"{column.table.name}.{column.name} references {foreign_key.column.table.name}, which is empty; seed it first")
+    return ids
+
+
+def seed_table(engine, table, count, options):
+    primary_keys = list(table.primary_key.columns)
+    association = len(primary_keys) > 1 and all(column.foreign_keys for column in primary_keys)
+    if association:
+        key_columns = primary_keys
+    else:
+        key_columns = [column for column in table.columns
+                       if column.name in NATURAL_KEY_COLUMNS and not column.foreign_keys][:1] or primary_keys
+    # Generated columns: everything except an autoincrement id when a natural key identifies rows,
+    # and columns the database fills in itself (server defaults, e.g. trigger-maintained counters)
+    columns = [column for column in table.columns
+               if (association or not (column.primary_key and key_columns != primary_keys))
+               and (column.primary_key or column.server_default is None)]
+
+    with engine.connect() as conn:
+        existing = {tuple(row) for row in conn.execute(select(*key_columns))}
+        parents = {column.name: parent_ids(conn, column) for column in columns if column.foreign_keys}
+
+    inserted, started = 0, time.perf_counter()
+    for batch_start in range(0, count, options.batch_size):
+        rng = random.Random(f"{options.seed}:{table.name}:{batch_start}")
+        rows = []
+        for i in range(batch_start, min(batch_start + options.batch_size, count)):
+            row = {}
+            for column in columns:
+                if column.name in parents:
+                    row[column.name] = pick(parents[column.name], rng, options.skew)
+                elif column.primary_key and not association:
+                    row[column.name] = i + 1
+                else:
+                    row[column.name] = column_value(table, column, i, rng, options)
+            key = tuple(row[column.name] for column in key_columns)
+            if key not in existing:
+                existing.add(key)
+                rows.append(row)
+        if rows:
+            with engine.begin() as conn:
+                conn.execute(table.insert(), rows)
+            inserted += len(rows)
+
+    elapsed = time.perf_counter() - started
+    print(f"{table.name}: {inserted} new rows in {elapsed:.1f}s ({inserted / max(elapsed, 1e-9):,.0f} rows/s), "
+          f"{count - inserted} skipped as duplicates")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('database_url', help='SQLAlchemy URL of the example database')
+    parser.add_argument('counts', nargs='+', metavar='TABLE=N', help='number of rows to have in each table')
+    parser.add_argument('--batch-size', type=int, default=10000, help='rows per INSERT batch (default: 10000)')
+    parser.add_argument('--skew', type=float, default=1.0,
+                        help='foreign key skew: 1 is uniform, 2+ gives a few parents most children (default: 1)')
+    parser.add_argument('--months', type=int, default=12, help='spread dates over this many past months (default: 12)')
+    parser.add_argument('--authors', type=int, default=1000,
+                        help='distinct names for string author columns (default: 1000)')
+    parser.add_argument('--seed', default='7.x', help='random seed; keep it to stay idempotent')
+    options = parser.parse_args()
+    options.now = datetime.utcnow().replace(microsecond=0)
+
+    engine = create_engine(options.database_url)
+    if engine.dialect.name == 'sqlite':
+        @event.listens_for(engine, 'connect')
+        def fast_sqlite_writes(dbapi_connection, connection_record):
+            # Seed data can be regenerated, so trade durability for speed
+            dbapi_connection.execute('PRAGMA synchronous = OFF')
+
+    metadata = MetaData()
+    metadata.reflect(engine)
+    counts = dict(pair.split('=', 1) for pair in options.counts)
+    unknown = set(counts) - set(metadata.tables)
+    if unknown:
+        raise SystemExit(f"Unknown tables: {', '.join(sorted(unknown))}. Available: {', '.join(sorted(metadata.tables))}")
+
+    # Parents before children so foreign keys can point at existing rows
+    for table in metadata.sorted_tables:
+        if table.name in counts:
+            seed_table(engine, table, int(counts[table.name]), options)
+
+
+if __name__ == '__main__':
+    main()
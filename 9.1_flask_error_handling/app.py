@@ -1,4 +1,6 @@
 import logging
+import os
+import sys
 from flask import Flask, request, jsonify
 from sqlalchemy import create_engine, Column, Integer, String
 from sqlalchemy.ext.declarative import declarative_base
@@ -7,6 +9,10 @@ from sqlalchemy.exc import SQLAlchemyError
 from werkzeug.exceptions import HTTPException
 from werkzeug.exceptions import RequestTimeout
 
+# Helpers shared with other chapters live in ../common
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.log_pipeline import setup_logging
+
 # Initialize Flask application
 app = Flask(__name__)
 
@@ -25,8 +31,10 @@ class Item(Base):
 Base.metadata.create_all(engine)
 Session = sessionmaker(bind=engine)
 
-# Setup logging
-logging.basicConfig(level=logging.ERROR)
+# Setup logging: JSON records written to stderr by a background thread
+app.config['LOG_LEVEL'] = 'ERROR'
+app.config['LOG_ASYNC'] = True
+setup_logging(app)
 
 # Error handlers
 @app.errorhandler(IndexError)
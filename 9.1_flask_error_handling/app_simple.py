@@ -1,4 +1,6 @@
 import logging
+import os
+import sys
 from flask import Flask, request, jsonify
 from sqlalchemy import create_engine, Column, Integer, String
 from sqlalchemy.exc import SQLAlchemyError
@@ -6,6 +8,10 @@ from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from werkzeug.exceptions import HTTPException
 
+# Helpers shared with other chapters live in ../common
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.log_pipeline import setup_logging
+
 # Define CustomException class
 class CustomException(Exception):
     def __init__(self, message, status_code):
@@ -30,8 +36,10 @@ class Item(Base):
 Base.metadata.create_all(engine)
 Session = sessionmaker(bind=engine)
 
-# Setup logging
-logging.basicConfig(level=logging.ERROR)
+# Setup logging: JSON records written to stderr by a background thread
+app.config['LOG_LEVEL'] = 'ERROR'
+app.config['LOG_ASYNC'] = True
+setup_logging(app)
 
 # Custom error handler for specific exceptions
 @app.errorhandler(CustomException)
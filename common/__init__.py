@@ -0,0 +1,7 @@
+"""Helpers imported by example apps of more than one chapter.
+
+The apps add the repository root to sys.path and import from here:
+
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+    from common.pagination import CountingPaginator
+"""
@@ -0,0 +1,34 @@
+"""Insert rows into an association table, skipping the ones that already exist.
+
+Enrollments and role assignments are written straight to their association
+tables instead of through a relationship collection, which would load the whole
+list to check membership. The database skips pairs that are already there
+(ON CONFLICT DO NOTHING, or INSERT IGNORE on MySQL) and the number of rows that
+were actually inserted is returned.
+
+    enrolled = insert_ignoring_duplicates(db, student_course, rows)
+"""
+from sqlalchemy import insert
+from sqlalchemy.dialects import postgresql, sqlite
+
+INSERT_CHUNK_SIZE = 500
+
+
+def insert_ignoring_duplicates(db, table, rows):
+    """Insert rows (dicts) into table, skipping existing primary keys; returns the number inserted."""
+    dialect = db.engine.dialect.name
+    inserted = 0
+    for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+        chunk = rows[start:start + INSERT_CHUNK_SIZE]
+        if dialect == 'postgresql':
+            # psycopg2 reports no usable rowcount for executemany, so one
+            # multi-row INSERT returns the keys of the rows it inserted
+            statement = postgresql.insert(table).values(chunk).on_conflict_do_nothing()
+            inserted += len(db.session.execute(statement.returning(*table.primary_key)).all())
+        elif dialect == 'sqlite':
+            inserted += db.session.execute(sqlite.insert(table).on_conflict_do_nothing(), chunk).rowcount
+        else:
+            # MySQLdb sends an executemany as one multi-row INSERT, whose
+            # rowcount leaves out the ignored rows
+            inserted += db.session.execute(insert(table).prefix_with('IGNORE'), chunk).rowcount
+    return inserted
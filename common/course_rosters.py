@@ -0,0 +1,100 @@
+"""Courses with their (paged) student lists as one JSON document.
+
+The database builds the student lists as JSON arrays (json_group_array on
+SQLite, json_agg on PostgreSQL) and the endpoint returns the finished document
+as it is. group_concat gave one comma-separated string that had to be split in
+Python, which broke names containing commas. MySQL's JSON_ARRAYAGG takes no
+ORDER BY and ignores the order of its input, so on MySQL the rosters are read
+as ordered rows and the document is built here.
+
+    counts = db.select(student_course.c.course_id, student_count).group_by(...).subquery()
+    return course_rosters(db, Course, Student, student_course, counts, students_limit, students_offset)
+"""
+from flask import Response, jsonify
+from sqlalchemy import Text, cast, func, literal_column, select
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+
+
+def json_object(dialect, **values):
+    build = func.json_build_object if dialect == 'postgresql' else func.json_object
+    return build(*[item for key, value in values.items() for item in (literal_column(f"'{key}'"), value)])
+
+
+def json_array_agg(dialect, value, order_by):
+    """Aggregate value over the group into a JSON array, in order_by order."""
+    if dialect == 'postgresql':
+        return func.json_agg(aggregate_order_by(value, *order_by))
+    # SQLite takes the rows in the order the (ordered) subquery returns them
+    return func.json_group_array(value)
+
+
+def nested_json(dialect, value):
+    # SQLite returns JSON from a subquery as text; json() stops it being quoted as a string
+    return func.json(value) if dialect == 'sqlite' else value
+
+
+def course_rosters(db, course, student, enrollments, counts, students_limit, students_offset):
+    """Response listing the courses in counts (course_id, student_count) with one page of their students.
+
+    Courses are ordered by student count, largest first, and each course's
+    students by name; students_limit=None returns all of them from the offset.
+    """
+    dialect = db.engine.dialect.name
+
+    # Number the students of each of those courses by name and keep the requested page
+    position = func.row_number().over(partition_by=enrollments.c.course_id, order_by=(student.name, student.id))
+    enrolled = select(
+        enrollments.c.course_id,
+        student.name.label('student_name'),
+        position.label('position')
+    ).join(student, student.id == enrollments.c.student_id) \
+     .join(counts, counts.c.course_id == enrollments.c.course_id) \
+     .subquery()
+    page = select(enrolled).where(enrolled.c.position > students_offset)
+    if students_limit is not None:
+        page = page.where(enrolled.c.position <= students_offset + students_limit)
+    page = page.order_by(enrolled.c.course_id, enrolled.c.position).subquery()
+
+    if dialect == 'mysql':
+        rosters = {}
+        for course_id, student_name in db.session.execute(
+                select(page.c.course_id, page.c.student_name).order_by(page.c.course_id, page.c.position)):
+            rosters.setdefault(course_id, []).append(student_name)
+        courses = db.session.execute(
+            select(course.id, course.name, counts.c.student_count)
+            .join(counts, counts.c.course_id == course.id)
+            .order_by(counts.c.student_count.desc(), course.id)
+        )
+        return jsonify([{
+            'course_id': course_id,
+            'course_name': course_name,
+            'student_count': student_count,
+            'students': rosters.get(course_id, [])
+        } for course_id, course_name, student_count in courses])
+
+    students = select(
+        page.c.course_id,
+        json_array_agg(dialect, page.c.student_name, order_by=[page.c.position]).label('students')
+    ).group_by(page.c.course_id).subquery()
+
+    courses = select(
+        course.id.label('course_id'),
+        course.name.label('course_name'),
+        counts.c.student_count,
+        students.c.students
+    ).join(counts, counts.c.course_id == course.id) \
+     .outerjoin(students, students.c.course_id == course.id) \
+     .order_by(counts.c.student_count.desc(), course.id) \
+     .subquery()
+
+    document = json_array_agg(dialect, json_object(
+        dialect,
+        course_id=courses.c.course_id,
+        course_name=courses.c.course_name,
+        student_count=courses.c.student_count,
+        students=nested_json(dialect, func.coalesce(courses.c.students, '[]'))
+    ), order_by=[courses.c.student_count.desc(), courses.c.course_id])
+
+    # One JSON string from the database, sent without decoding and re-encoding it
+    payload = db.session.execute(select(func.coalesce(cast(document, Text), '[]'))).scalar()
+    return Response(payload, mimetype='application/json')
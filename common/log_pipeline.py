@@ -0,0 +1,152 @@
+"""Non-blocking JSON logging for the example apps.
+
+logging.basicConfig(filename=...) writes every record to the file from the
+thread that handles the request, so slow disks and verbose levels show up
+directly in response times. setup_logging() instead puts records on a queue
+(QueueHandler) and a background QueueListener writes them out: whatever piled
+up while it was busy is written in one batch, the file rotates by size and
+every line is a JSON object.
+
+Set LOG_ASYNC = False to write synchronously, e.g. while debugging a crash
+where the last records must not sit in the queue.
+
+    app.config['LOG_FILE'] = 'app.log'
+    setup_logging(app)
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+from datetime import datetime, timezone
+
+DEFAULTS = {
+    'LOG_ASYNC': True,
+    'LOG_FILE': None,  # None logs to stderr
+    'LOG_LEVEL': 'INFO',
+    'LOG_MAX_BYTES': 10 * 1024 * 1024,
+    'LOG_BACKUP_COUNT': 5,
+    'LOG_BATCH_SIZE': 500,
+}
+
+# Attributes every LogRecord has; anything else was passed through `extra=`
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        entry.update((key, value) for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES)
+        return json.dumps(entry, default=str)
+
+
+class BatchingRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """Buffers formatted records and writes them with as few write calls as possible.
+
+    The buffer is written when it holds batch_size records or when flush() is
+    called; the listener calls it whenever the queue runs empty. A batch that
+    would take the file past max_bytes, the first one included, is split at
+    line boundaries and the file is rotated between the parts, so only a single
+    line longer than max_bytes can make a file exceed it.
+    """
+
+    def __init__(self, filename, max_bytes, backup_count, batch_size):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8', delay=True)
+        self.batch_size = batch_size
+        self.buffer = []
+
+    def emit(self, record):
+        try:
+            self.buffer.append(self.format(record) + self.terminator)
+        except Exception:
+            self.handleError(record)
+            return
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            if not self.buffer:
+                return
+            lines, self.buffer = self.buffer, []
+            if self.stream is None:
+                self.stream = self._open()
+            size = self.stream.seek(0, 2)  # bytes already in the file
+            part = []
+            for line in lines:
+                length = len(line.encode('utf-8'))
+                if self.maxBytes and size + length > self.maxBytes and (size or part):
+                    self.stream.write(''.join(part))
+                    part = []
+                    self.doRollover()
+                    if self.stream is None:
+                        self.stream = self._open()
+                    size = 0
+                part.append(line)
+                size += length
+            self.stream.write(''.join(part))
+            self.stream.flush()
+
+    def close(self):
+        self.flush()
+        super().close()
+
+
+class BatchingQueueListener(logging.handlers.QueueListener):
+    """QueueListener that flushes its handlers each time the queue is drained."""
+
+    def dequeue(self, block):
+        try:
+            return self.queue.get_nowait()
+        except queue.Empty:
+            for handler in self.handlers:
+                handler.flush()
+            return self.queue.get(block)
+
+    def stop(self):
+        if self._thread is None:
+            return  # already stopped
+        super().stop()
+        for handler in self.handlers:
+            handler.flush()
+
+
+def setup_logging(app):
+    """Route the root logger through the pipeline configured by app.config."""
+    config = {key: app.config.get(key, default) for key, default in DEFAULTS.items()}
+
+    if config['LOG_FILE']:
+        output = BatchingRotatingFileHandler(config['LOG_FILE'], config['LOG_MAX_BYTES'], config['LOG_BACKUP_COUNT'],
+                                             config['LOG_BATCH_SIZE'] if config['LOG_ASYNC'] else 1)
+    else:
+        output = logging.StreamHandler(sys.stderr)
+
+    root = logging.getLogger()
+    root.setLevel(config['LOG_LEVEL'])
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+
+    if not config['LOG_ASYNC']:
+        output.setFormatter(JsonFormatter())
+        root.addHandler(output)
+        return None
+
+    # Records are formatted to JSON in the calling thread (QueueHandler.prepare),
+    # so the listener only has to write the finished lines
+    queue_handler = logging.handlers.QueueHandler(queue.SimpleQueue())
+    queue_handler.setFormatter(JsonFormatter())
+    output.setFormatter(logging.Formatter('%(message)s'))
+    root.addHandler(queue_handler)
+
+    listener = BatchingQueueListener(queue_handler.queue, output)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
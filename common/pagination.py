@@ -0,0 +1,136 @@
+"""Offset pagination without a COUNT(*) of the whole result on every page.
+
+Flask-SQLAlchemy's paginate() counts the whole filtered query for each page
+request. CountingPaginator.paginate() fetches one row more than the page to
+know whether a next page exists, and works out the total according to a count
+mode:
+
+- exact: COUNT(*), cached per normalized filter signature for
+  PAGINATION_COUNT_TTL seconds and dropped as soon as a write to one of the
+  counted tables commits (see written_tables.py)
+- estimate: table statistics, scaled by the selectivity of the filters over the
+  rows of the last PAGINATION_COUNT_SAMPLE_SIZE ids when filters are applied
+- none: no total
+
+The last page tells the exact total for free, whatever the mode.
+
+    paginator = CountingPaginator(app, db)
+    page = paginator.paginate(query, page, per_page, count_mode, signature, (Book, Author))
+"""
+import threading
+import time
+from collections import namedtuple
+from contextlib import nullcontext
+
+from sqlalchemy import func, text
+
+from .written_tables import on_commit_writes
+
+DEFAULTS = {
+    'PAGINATION_COUNT_TTL': 30,  # seconds; also bounds staleness after writes by other processes
+    'PAGINATION_COUNT_SAMPLE_SIZE': 1000,
+}
+
+COUNT_MODES = ('exact', 'estimate', 'none')
+
+Page = namedtuple('Page', ['items', 'total', 'pages', 'page', 'per_page', 'has_next'])
+
+
+class CountingPaginator:
+    def __init__(self, app, db, phase=None):
+        """`phase`, if given, is called with 'fetch' or 'count' and must return a
+        context manager wrapped around that step, e.g. to time it."""
+        config = {key: app.config.get(key, default) for key, default in DEFAULTS.items()}
+        self.ttl = config['PAGINATION_COUNT_TTL']
+        self.sample_size = config['PAGINATION_COUNT_SAMPLE_SIZE']
+        self.db = db
+        self.phase = phase or (lambda name: nullcontext())
+        self._counts = {}
+        self._lock = threading.Lock()
+
+        with app.app_context():
+            self.engine = db.engine
+        on_commit_writes(self._invalidate_on_commit)
+
+    def _invalidate_on_commit(self, engine, tables):
+        if engine is self.engine:
+            self.invalidate(tables)
+
+    def invalidate(self, tables):
+        # None stands for a write whose table could not be determined
+        with self._lock:
+            for key in [key for key in self._counts if None in tables or key[0] & tables]:
+                del self._counts[key]
+
+    def _cached_count(self, query, key):
+        now = time.monotonic()
+        with self._lock:
+            cached = self._counts.get(key)
+        if cached and cached[1] > now:
+            return cached[0]
+        total = query.order_by(None).count()
+        with self._lock:
+            self._counts[key] = (total, now + self.ttl)
+        return total
+
+    def _id_range(self, model):
+        """(floor, rows, highest id): the rows with an id above floor are the last PAGINATION_COUNT_SAMPLE_SIZE ids."""
+        max_id = self.db.session.query(func.max(model.id)).scalar() or 0
+        floor = max(max_id - self.sample_size, 0)
+        rows = self.db.session.query(func.count(model.id)).filter(model.id > floor).scalar()
+        return floor, rows, max_id
+
+    def _table_row_estimate(self, model):
+        session, dialect = self.db.session, self.engine.dialect.name
+        if dialect == 'postgresql':
+            sql = "SELECT reltuples::bigint FROM pg_class WHERE relname = :table"
+        elif dialect == 'mysql':
+            sql = "SELECT table_rows FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = :table"
+        else:
+            sql = None
+        estimate = session.execute(text(sql), {'table': model.__table__.name}).scalar() if sql else None
+        if not estimate:
+            # SQLite keeps no cheap row count: scale the highest id by the share
+            # of ids still in use among the last ones (deleted rows leave gaps)
+            floor, rows, max_id = self._id_range(model)
+            estimate = max_id * rows / (max_id - floor) if max_id else 0
+        return int(estimate or 0)
+
+    def _estimated_count(self, query, model, filtered):
+        total = self._table_row_estimate(model)
+        if not filtered or not total:
+            return total
+        # Selectivity of the filters over the rows of the last id range
+        floor, rows, _ = self._id_range(model)
+        if not rows:
+            return total
+        matched = query.order_by(None).filter(model.id > floor).count()
+        return round(total * matched / rows)
+
+    def paginate(self, query, page, per_page, count_mode, signature, models):
+        """Fetch one page of `query` and work out its total according to `count_mode`.
+
+        `signature` is a hashable, normalized form of the applied filters and
+        `models` lists the models the query reads, the paged one first.
+        """
+        page, per_page = max(page, 1), max(per_page, 1)
+        offset = (page - 1) * per_page
+        with self.phase('fetch'):
+            rows = query.limit(per_page + 1).offset(offset).all()
+        items, has_next = rows[:per_page], len(rows) > per_page
+
+        if items and not has_next or page == 1 and not items:
+            # The last page tells the exact total for free
+            total = offset + len(items)
+        elif count_mode == 'none':
+            total = None
+        elif count_mode == 'estimate':
+            with self.phase('count'):
+                total = max(self._estimated_count(query, models[0], bool(signature)), offset + len(items) + has_next)
+        else:
+            tables = frozenset(model.__table__.name for model in models)
+            with self.phase('count'):
+                total = self._cached_count(query, (tables, signature))
+
+        pages = -(-total // per_page) if total is not None else None
+        return Page(items, total, pages, page, per_page, has_next)
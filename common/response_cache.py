@@ -0,0 +1,137 @@
+"""Cache of computed responses that is dropped when the tables they read change.
+
+Entries live in an in-process LRU with a TTL and, with a Redis URL, in Redis as
+well so that all workers share them. Every table has a version number that is
+bumped after a commit writes to it (see written_tables.py) and is part of the
+cache key, so a write makes the old entries unreachable at once. A write to a
+table that cannot be determined bumps the version of ALL_TABLES, which is part
+of every key. The TTL bounds how long writes this process cannot see (another
+worker without Redis, the 7.6 seeder, a database console) go unnoticed.
+Concurrent misses on the same key wait for a single computation instead of all
+hitting the database, across workers too when Redis is used.
+
+    cache = ResponseCache(ttl=60, max_entries=1024)
+    cache.track_writes(db.engine)
+    body = cache.get_or_compute(cache.key(('movie',), params), compute)
+
+Values are strings.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from .written_tables import on_commit_writes
+
+try:
+    import redis
+except ImportError:  # the shared tier is optional
+    redis = None
+
+ALL_TABLES = '*'  # version bumped by writes to an unknown table
+
+
+class ResponseCache:
+    def __init__(self, ttl, max_entries, redis_url=None):
+        if redis_url and redis is None:
+            raise RuntimeError("A cache Redis URL is set but the redis package is not installed")
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.redis = redis.Redis.from_url(redis_url) if redis_url else None
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def track_writes(self, engine):
+        """Invalidate the tables written by every commit on engine."""
+        on_commit_writes(lambda written_by, tables: written_by is engine and self.invalidate(tables))
+
+    def versions(self, tables):
+        """Version of each table, preceded by the version of all tables."""
+        tables = [ALL_TABLES, *tables]
+        if self.redis is not None:
+            return [int(version or 0) for version in self.redis.mget([f"table_version:{table}" for table in tables])]
+        with self._lock:
+            return [self._versions.get(table, 0) for table in tables]
+
+    def invalidate(self, tables):
+        # None stands for a write whose table could not be determined. Bumping
+        # the version that is part of every key drops the entries of all
+        # tables, in Redis too and for tables this process never read
+        if None in tables:
+            with self._lock:
+                self._entries.clear()
+            tables = (set(tables) - {None}) | {ALL_TABLES}
+        for table in tables:
+            if self.redis is not None:
+                self.redis.incr(f"table_version:{table}")
+            with self._lock:
+                self._versions[table] = self._versions.get(table, 0) + 1
+
+    def key(self, tables, params):
+        versions = ",".join(f"{table}={version}" for table, version in zip([ALL_TABLES, *tables], self.versions(tables)))
+        return f"query:{versions}:{json.dumps(params)}"
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    return value
+                del self._entries[key]
+        if self.redis is not None:
+            value = self.redis.get(key)
+            if value is not None:
+                # Keep the local copy no longer than the shared one has left
+                self._store_local(key, value.decode(), max(self.redis.ttl(key), 0))
+                return value.decode()
+        return None
+
+    def set(self, key, value):
+        self._store_local(key, value, self.ttl)
+        if self.redis is not None:
+            self.redis.set(key, value, ex=self.ttl)
+
+    def _store_local(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _wait_for_other_worker(self, key):
+        # Another process holds the Redis lock for this key; give it a moment to fill the entry
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            time.sleep(0.02)
+            value = self.get(key)
+            if value is not None:
+                return value
+        return None
+
+    def get_or_compute(self, key, compute):
+        """Cached value of key, computed once by compute() on a miss. None from compute() is not stored."""
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        with self._lock:
+            flight = self._in_flight.setdefault(key, threading.Lock())
+        try:
+            with flight:
+                value = self.get(key)
+                if value is None and self.redis is not None and not self.redis.set(f"{key}:lock", 1, nx=True, ex=10):
+                    value = self._wait_for_other_worker(key)
+                if value is None:
+                    value = compute()
+                    if value is not None:
+                        self.set(key, value)
+                    if self.redis is not None:
+                        self.redis.delete(f"{key}:lock")
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+        return value
@@ -0,0 +1,73 @@
+"""Tell caches which tables each committed transaction wrote to.
+
+The example apps cache pagination totals, role maps and aggregate responses,
+and drop them when a table they read changes. on_commit_writes() registers one
+set of engine listeners for the whole process. Every INSERT, UPDATE or DELETE
+is noted on its connection, whether it comes from a session flush, a Core
+statement or raw text() SQL, and when the transaction commits each callback
+gets (engine, tables). A transaction that rolls back reports nothing.
+
+    on_commit_writes(lambda engine, tables: cache.invalidate(tables))
+
+A table name of None stands for a write whose table could not be determined;
+callbacks should treat every table as written then. Only writes made through
+this process are seen, so caches still need a TTL for writes made elsewhere
+(other workers, CLI commands, the 7.6 seeder).
+"""
+import re
+import threading
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+RAW_DML = re.compile(r'\s*(INSERT|REPLACE|UPDATE|DELETE|MERGE)\b', re.IGNORECASE)
+RAW_DML_TABLE = re.compile(
+    r'\s*(?:INSERT(?:\s+OR\s+\w+|\s+IGNORE)?\s+INTO|REPLACE\s+INTO|UPDATE(?:\s+OR\s+\w+)?|DELETE\s+FROM)'
+    r'\s+(?:[\w`"\[\]]+\.)?[`"\[]?(\w+)[`"\]]?\s',
+    re.IGNORECASE
+)
+
+_callbacks = []
+_callbacks_lock = threading.Lock()
+
+
+def on_commit_writes(callback):
+    """Call callback(engine, tables) after every commit that wrote to tables.
+
+    Returns callback, so it can be used as a decorator as well.
+    """
+    with _callbacks_lock:
+        if not _callbacks:
+            event.listen(Engine, 'after_cursor_execute', _note_written_table)
+            event.listen(Engine, 'commit', _report_written_tables)
+            event.listen(Engine, 'rollback', _forget_written_tables)
+        _callbacks.append(callback)
+    return callback
+
+
+def written_table(statement, context):
+    """Name of the table a statement writes to, None if unknown, False if it writes nothing."""
+    if context.isinsert or context.isupdate or context.isdelete:
+        table = getattr(getattr(context.compiled, 'statement', None), 'table', None)
+        return getattr(table, 'name', None)
+    if not RAW_DML.match(statement):
+        return False
+    match = RAW_DML_TABLE.match(statement + ' ')
+    return match.group(1).lower() if match else None
+
+
+def _note_written_table(conn, cursor, statement, parameters, context, executemany):
+    table = written_table(statement, context)
+    if table is not False:
+        conn.info.setdefault('written_tables', set()).add(table)
+
+
+def _report_written_tables(conn):
+    tables = conn.info.pop('written_tables', None)
+    if tables:
+        for callback in list(_callbacks):
+            callback(conn.engine, tables)
+
+
+def _forget_written_tables(conn):
+    conn.info.pop('written_tables', None)